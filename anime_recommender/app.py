@@ -1,13 +1,212 @@
-from flask import Flask, render_template, request, jsonify
-import pandas as pd
+from flask import Flask, render_template, request, jsonify, g
+import functools
+import gzip
+import json
 import os
-from recommender import AnimeRecommender
-import numpy as np
+import threading
+import time
+from batching import DEFAULT_MAX_BATCH_SIZE, MicroBatcher
+from metrics import (LATENCY_BUCKETS, Counter, Histogram, prometheus_histogram, prometheus_metric,
+                     stage_metrics)
 
 app = Flask(__name__)
 
-# Initialize the recommender system
-recommender = AnimeRecommender()
+# Recommender configuration: a prebuilt artifact is loaded when one is configured
+# (build it with `python anime_recommender/artifact.py`); ANIME_LEAN_MODEL=1 keeps
+# the float32, text-free catalog so more workers fit on a host
+MODEL_ARTIFACT = os.environ.get('ANIME_MODEL_ARTIFACT')
+LEAN_MODEL = os.environ.get('ANIME_LEAN_MODEL', '') == '1'
+# ANIME_BACKEND=precomputed serves title recommendations from a SQLite database
+# of neighbor lists instead (build it with `python anime_recommender/precomputed.py`)
+BACKEND = os.environ.get('ANIME_BACKEND', 'model')
+
+# Client/proxy cache lifetime for /anime_list; ETags carry the model version so
+# clients can revalidate cheaply once it expires
+ANIME_LIST_MAX_AGE = int(os.environ.get('ANIME_LIST_MAX_AGE', 300))
+ANIME_LIST_MAX_LIMIT = 1000
+
+# Optional micro-batching of /recommend: set ANIME_BATCH_MAX_WAIT_MS above 0 to
+# let concurrent requests wait that long to be scored together in one product
+BATCH_MAX_WAIT_MS = float(os.environ.get('ANIME_BATCH_MAX_WAIT_MS', 0))
+BATCH_MAX_SIZE = int(os.environ.get('ANIME_BATCH_MAX_SIZE', DEFAULT_MAX_BATCH_SIZE))
+
+# Backend method behind each /recommend type; a backend without one (the
+# precomputed backend only has get_recommendations) answers that type with 501
+RECOMMEND_METHODS = {
+    'anime': 'get_recommendations',
+    'features': 'get_recommendations_by_features',
+    'profile': 'get_recommendations_for_profile',
+}
+
+# Seconds clients are told to wait before retrying while the model loads
+LOADING_RETRY_AFTER = 5
+
+# Request counts and latencies per endpoint, always collected; per-stage
+# timings inside the recommender are added when ANIME_STAGE_TIMING=1
+request_counter = Counter()
+request_latency = {}
+
+# The model is loaded on a background thread so the server accepts connections
+# (and answers /healthz) immediately; model endpoints answer 503 until it is ready
+recommender = None
+batcher = None
+model_ready = threading.Event()
+model_error = None
+load_seconds = None
+
+def create_recommender():
+    """Build the configured backend; the heavy imports happen here, not when the app is imported"""
+    if BACKEND == 'precomputed':
+        from precomputed import DEFAULT_DATABASE_PATH, PrecomputedRecommender
+        return PrecomputedRecommender(os.environ.get('ANIME_PRECOMPUTED_DB', DEFAULT_DATABASE_PATH))
+    if BACKEND != 'model':
+        raise ValueError(f"Unknown ANIME_BACKEND '{BACKEND}' (expected 'model' or 'precomputed')")
+    from recommender import AnimeRecommender
+    if MODEL_ARTIFACT:
+        return AnimeRecommender.from_artifact(MODEL_ARTIFACT, lean=LEAN_MODEL)
+    return AnimeRecommender(lean=LEAN_MODEL)
+
+def load_model():
+    """Load and warm the recommender, then publish it to the request handlers"""
+    global recommender, batcher, model_error, load_seconds
+    started = time.perf_counter()
+    try:
+        loaded = create_recommender()
+        # Build the title index and serialize the full list, then answer one
+        # query so the matrix pages and result metadata are in memory before traffic
+        loaded.title_index
+        get_title_listing(loaded)
+        if len(loaded.df):
+            loaded.get_recommendations(loaded.df['title'].iloc[0]).to_json()
+        if BATCH_MAX_WAIT_MS > 0:
+            batcher = MicroBatcher(loaded, BATCH_MAX_WAIT_MS, BATCH_MAX_SIZE)
+        recommender = loaded
+    except Exception as e:
+        model_error = f'{type(e).__name__}: {e}'
+        print(f"Model failed to load: {model_error}")
+        return
+    load_seconds = time.perf_counter() - started
+    model_ready.set()
+    print(f"Model ready in {load_seconds:.2f}s")
+
+_loader = None
+_loader_pid = None
+_loader_lock = threading.Lock()
+
+def start_loading():
+    """Start the loader thread unless the model is loaded, failed, or is already loading in this process.
+
+    Threads do not survive fork, so a worker forked (gunicorn --preload) from a
+    parent whose model is not ready starts its own loader on its first request.
+    """
+    global _loader, _loader_pid
+    if model_ready.is_set() or model_error is not None or _loader_pid == os.getpid():
+        return
+    with _loader_lock:
+        if _loader_pid != os.getpid() and not model_ready.is_set():
+            _loader = threading.Thread(target=load_model, name='model-loader', daemon=True)
+            _loader.start()
+            _loader_pid = os.getpid()
+
+def _finish_loading_before_fork():
+    """Make a fork wait for the load in progress, so the child inherits the loaded model, not half-imported modules"""
+    if _loader is not None and _loader_pid == os.getpid() and threading.current_thread() is not _loader:
+        _loader.join()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_finish_loading_before_fork)
+start_loading()
+
+def wait_until_ready(timeout=None):
+    """Block until the background load finishes; returns whether the model is ready, raising if it failed"""
+    start_loading()
+    if not model_ready.is_set():
+        _loader.join(timeout)
+    if model_error is not None:
+        raise RuntimeError(f"Model failed to load: {model_error}")
+    return model_ready.is_set()
+
+def requires_model(view):
+    """Answer 503 with Retry-After instead of calling view until the model is ready"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not model_ready.is_set():
+            message = 'Model is still loading' if model_error is None else f'Model failed to load: {model_error}'
+            response = jsonify({'error': message})
+            response.headers['Retry-After'] = str(LOADING_RETRY_AFTER)
+            return response, 503
+        return view(*args, **kwargs)
+    return wrapper
+
+def run_query(kind, **params):
+    """Answer a 'title', 'features' or 'profile' request, through the micro-batcher when it is enabled"""
+    if batcher is not None:
+        return batcher.submit(kind, **params)
+    if kind == 'title':
+        return recommender.get_recommendations(**params)
+    if kind == 'profile':
+        return recommender.get_recommendations_for_profile(**params)
+    return recommender.get_recommendations_by_features(**params)
+
+_title_listing = None
+
+def get_title_listing(model=None):
+    """Pre-serialized (and pre-gzipped) full title list for the current model version.
+
+    Titles come from the title index, like the paged listing, so removed
+    titles are left out; they stay in catalog order.
+    """
+    global _title_listing
+    model = model or recommender
+    if _title_listing is None or _title_listing['version'] != model.model_version:
+        titles = [str(t) for t in model.title_index.titles]
+        payload = json.dumps({'anime_titles': titles}).encode('utf-8')
+        _title_listing = {
+            'version': model.model_version,
+            'json': payload,
+            'gzip': gzip.compress(payload),
+        }
+    return _title_listing
+
+def cacheable(response, etag):
+    """Attach caching headers and turn the response into a 304 if the client's copy is current"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={ANIME_LIST_MAX_AGE}'
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+@app.before_request
+def ensure_model_loading():
+    start_loading()
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Count the request and observe its latency under its endpoint"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unmatched'
+        request_counter.inc((endpoint, response.status_code))
+        histogram = request_latency.get(endpoint)
+        if histogram is None:
+            histogram = request_latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS))
+        histogram.observe(time.perf_counter() - start)
+    return response
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: 200 once the model is loaded and warmed, 503 until then or if loading failed"""
+    if model_ready.is_set():
+        return jsonify({'ready': True, 'model_version': recommender.model_version, 'load_seconds': load_seconds})
+    return jsonify({'ready': False, 'error': model_error}), 503
 
 @app.route('/')
 def index():
@@ -15,6 +214,7 @@ def index():
     return render_template('index.html')
 
 @app.route('/recommend', methods=['POST'])
+@requires_model
 def recommend():
     """API endpoint for getting anime recommendations"""
     data = request.get_json()
@@ -22,6 +222,13 @@ def recommend():
     # Get the recommendation type and parameters
     rec_type = data.get('type', 'anime')
     num_recommendations = int(data.get('num_recommendations', 10))
+    filtered = bool(data.get('filters') or data.get('exclude'))
+    
+    # Requests the configured backend has no way to answer
+    if rec_type in RECOMMEND_METHODS and not hasattr(recommender, RECOMMEND_METHODS[rec_type]):
+        return jsonify({'error': f"'{rec_type}' recommendations need the model backend"}), 501
+    if filtered and not getattr(recommender, 'supports_filters', True):
+        return jsonify({'error': 'Filtered recommendations need the model backend'}), 501
     
     try:
         if rec_type == 'anime':
@@ -29,7 +236,10 @@ def recommend():
             if not anime_title:
                 return jsonify({'error': 'Anime title is required'}), 400
             
-            recommendations = recommender.get_recommendations(anime_title, num_recommendations)
+            params = {'title': anime_title, 'num_recommendations': num_recommendations}
+            if filtered:
+                params.update(filters=data.get('filters'), exclude=data.get('exclude'))
+            recommendations = run_query('title', **params)
             
         elif rec_type == 'features':
             genres = data.get('genres', [])
@@ -41,42 +251,164 @@ def recommend():
             themes = themes if themes else None
             demographics = demographics if demographics else None
             
-            recommendations = recommender.get_recommendations_by_features(
+            recommendations = run_query(
+                'features',
                 genres=genres,
                 themes=themes,
                 demographics=demographics,
-                num_recommendations=num_recommendations
+                num_recommendations=num_recommendations,
+                match=data.get('match', 'any'),
+                exclude=data.get('exclude'),
+                filters=data.get('filters')
+            )
+            
+        elif rec_type == 'profile':
+            anime_titles = data.get('anime_titles', [])
+            if not anime_titles:
+                return jsonify({'error': 'At least one anime title is required'}), 400
+            
+            recommendations = run_query(
+                'profile',
+                titles=anime_titles,
+                weights=data.get('weights'),
+                num_recommendations=num_recommendations,
+                filters=data.get('filters'),
+                exclude=data.get('exclude')
             )
         else:
             return jsonify({'error': 'Invalid recommendation type'}), 400
         
-        # Convert recommendations to JSON-serializable format
-        if recommendations.empty:
-            return jsonify({'recommendations': []})
-        
-        # Convert DataFrame to list of dictionaries
-        rec_list = []
-        for _, row in recommendations.iterrows():
-            rec_list.append({
-                'title': row['title'],
-                'genres': row['genres'] if pd.notna(row['genres']) else '',
-                'themes': row['themes'] if pd.notna(row['themes']) else '',
-                'demographics': row['demographics'] if pd.notna(row['demographics']) else '',
-                'similarity_score': float(row['similarity_score']) if pd.notna(row['similarity_score']) else 0.0
-            })
-        
-        return jsonify({'recommendations': rec_list})
+        # Serialize straight from the result's index/score arrays and pre-encoded metadata
+        with stage_metrics.time('json_encoding'):
+            body = recommendations.to_json()
+        return app.response_class(body, mimetype='application/json')
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cache_stats')
+@requires_model
+def cache_stats():
+    """API endpoint exposing result cache counters for sizing the cache"""
+    return jsonify(recommender.cache_stats())
+
+@app.route('/batch_stats')
+def batch_stats():
+    """API endpoint exposing micro-batching settings and batch-size/queue-delay histograms"""
+    if batcher is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **batcher.stats()})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of request, stage, cache, batching and model metrics"""
+    lines = []
+    lines += prometheus_metric('anime_requests_total', 'counter', 'HTTP requests by endpoint and status',
+                               request_counter.items(), ('endpoint', 'status'))
+    lines += prometheus_histogram('anime_request_duration_seconds', 'HTTP request latency by endpoint',
+                                  [((e,), h) for e, h in sorted(request_latency.items())], ('endpoint',))
+    lines += prometheus_metric('anime_stage_timing_enabled', 'gauge', 'Whether per-stage timing is on',
+                               [((), int(stage_metrics.enabled))])
+    lines += prometheus_histogram('anime_stage_duration_seconds', 'Time spent in each recommender stage',
+                                  [((s,), h) for s, h in sorted(stage_metrics.stages.items())], ('stage',))
+    lines += prometheus_metric('anime_model_ready', 'gauge', 'Whether the model is loaded and warmed',
+                               [((), int(model_ready.is_set()))])
+    if model_ready.is_set():
+        cache = recommender.cache_stats()
+        matrix = getattr(recommender, 'tfidf_matrix', None)
+        lines += prometheus_metric('anime_model_load_seconds', 'gauge', 'Time taken to load and warm the model',
+                                   [((), load_seconds)])
+        for name in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+            lines += prometheus_metric(f'anime_cache_{name}_total', 'counter', f'Result cache {name}',
+                                       [((), cache[name])])
+        lines += prometheus_metric('anime_cache_entries', 'gauge', 'Results currently cached',
+                                   [((), cache['size'])])
+        lines += prometheus_metric('anime_model_rows', 'gauge', 'Titles in the model', [((), len(recommender.df))])
+        if matrix is not None:
+            lines += prometheus_metric('anime_model_nnz', 'gauge', 'Non-zero entries in the feature matrix',
+                                       [((), matrix.nnz)])
+            lines += prometheus_metric('anime_model_matrix_bytes', 'gauge', 'Bytes held by the feature matrix arrays',
+                                       [((), matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)])
+    if batcher is not None:
+        lines += prometheus_histogram('anime_batch_size', 'Requests scored per micro-batch',
+                                      [((), batcher.batch_sizes)])
+        lines += prometheus_histogram('anime_batch_queue_delay_ms', 'Time requests waited for their micro-batch',
+                                      [((), batcher.queue_delays)])
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@app.route('/memory')
+@requires_model
+def memory():
+    """API endpoint breaking down the bytes held by each model component"""
+    return jsonify(recommender.memory_report())
+
+@app.route('/facets')
+@requires_model
+def facets():
+    """API endpoint for tag counts, optionally over the titles matching comma-separated tag filters"""
+    def tags(name):
+        value = request.args.get(name, '')
+        return [t for t in value.split(',') if t.strip()] or None
+    
+    if not hasattr(recommender, 'facet_counts'):
+        return jsonify({'error': 'Facet counts need the model backend'}), 501
+    try:
+        return jsonify(recommender.facet_counts(
+            genres=tags('genres'),
+            themes=tags('themes'),
+            demographics=tags('demographics'),
+            match=request.args.get('match', 'any')
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/search')
+@requires_model
+def search():
+    """API endpoint for looking up anime titles, tolerant of partial input and typos"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    try:
+        return jsonify({'results': recommender.search_titles(query, limit)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/anime_list')
+@requires_model
 def anime_list():
-    """API endpoint for getting a list of all anime titles"""
+    """API endpoint for getting anime titles.
+
+    Without parameters this returns every title. With `prefix`, `offset` or
+    `limit` it returns one page of the alphabetically sorted titles that start
+    with `prefix`, along with the total number of matches.
+    """
     try:
-        # Get unique anime titles from the dataset
-        titles = recommender.df['title'].tolist()
-        return jsonify({'anime_titles': titles})
+        version = recommender.model_version
+        if not any(arg in request.args for arg in ('prefix', 'offset', 'limit')):
+            listing = get_title_listing()
+            if request.accept_encodings['gzip']:
+                response = app.response_class(listing['gzip'], mimetype='application/json')
+                response.headers['Content-Encoding'] = 'gzip'
+                return cacheable(response, f'{version}-gz')
+            return cacheable(app.response_class(listing['json'], mimetype='application/json'), version)
+        
+        prefix = request.args.get('prefix', '')
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 100, type=int), 0), ANIME_LIST_MAX_LIMIT)
+        
+        # Binary-search the presorted titles for the prefix, then slice out the page
+        index = recommender.title_index
+        lo, hi = index.prefix_range(prefix)
+        rows = index.sorted_rows[lo + offset:min(lo + offset + limit, hi)]
+        response = jsonify({
+            'anime_titles': [str(t) for t in index.titles[rows]],
+            'total': hi - lo,
+            'offset': offset,
+            'limit': limit,
+        })
+        return cacheable(response, version)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
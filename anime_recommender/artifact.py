@@ -0,0 +1,149 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from recommender import make_vectorizer
+from columnar import load_strings, save_strings
+
+# Bump this whenever the on-disk layout changes so stale artifacts are rejected
+ARTIFACT_FORMAT_VERSION = 1
+
+# Columns kept in the compact metadata table (everything served at query time)
+METADATA_COLUMNS = ['title', 'genres', 'themes', 'demographics', 'rating']
+
+# Pointer file naming the most recent build inside an artifact root
+LATEST_FILE = 'LATEST'
+
+def save_artifact(recommender, out_dir):
+    """Write the fitted vectorizer, TF-IDF matrix and metadata to out_dir"""
+    os.makedirs(out_dir, exist_ok=True)
+    matrix = recommender.tfidf_matrix.tocsr()
+    df = recommender.df
+
+    # Only the live catalog is saved; tombstoned rows are compacted away
+    live = ~recommender._removed
+    if not live.all():
+        matrix = matrix[live]
+        df = df[live].reset_index(drop=True)
+    if not matrix.has_sorted_indices:
+        matrix = matrix.sorted_indices()
+
+    if recommender.vectorizer_kind == 'hashing':
+        hashing = recommender.tfidf[0].get_params()
+        vectorizer = {'kind': 'hashing', 'n_features': hashing['n_features']}
+        idf = recommender.tfidf[-1].idf_
+    else:
+        # Vocabulary is stored as a term list ordered by column index
+        vocabulary = recommender.tfidf.vocabulary_
+        terms = [None] * len(vocabulary)
+        for term, column in vocabulary.items():
+            terms[column] = term
+        with open(os.path.join(out_dir, 'terms.json'), 'w', encoding='utf-8') as f:
+            json.dump(terms, f)
+        params = recommender.tfidf.get_params()
+        vectorizer = {'kind': 'tfidf', 'stop_words': params['stop_words'], 'max_features': params['max_features']}
+        idf = recommender.tfidf.idf_
+    np.save(os.path.join(out_dir, 'idf.npy'), idf)
+
+    # Raw CSR arrays so they can be memory-mapped back without parsing
+    np.save(os.path.join(out_dir, 'tfidf_data.npy'), matrix.data)
+    np.save(os.path.join(out_dir, 'tfidf_indices.npy'), matrix.indices)
+    np.save(os.path.join(out_dir, 'tfidf_indptr.npy'), matrix.indptr)
+
+    for col in METADATA_COLUMNS:
+        values = df[col] if col in df.columns else [np.nan] * len(df)
+        save_strings(os.path.join(out_dir, f'meta_{col}'), values)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': recommender.model_version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'n_rows': int(matrix.shape[0]),
+        'n_features': int(matrix.shape[1]),
+        'nnz': int(matrix.nnz),
+        'vectorizer': vectorizer,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def build_artifact(recommender, root_dir):
+    """Save a new versioned build under root_dir and point LATEST at it"""
+    out_dir = os.path.join(root_dir, recommender.model_version)
+    manifest = save_artifact(recommender, out_dir)
+    with open(os.path.join(root_dir, LATEST_FILE), 'w') as f:
+        f.write(recommender.model_version)
+    return out_dir, manifest
+
+def resolve_artifact_dir(path):
+    """Return the build directory for path, following LATEST in an artifact root"""
+    latest = os.path.join(path, LATEST_FILE)
+    if os.path.exists(latest):
+        with open(latest) as f:
+            return os.path.join(path, f.read().strip())
+    return path
+
+def load_artifact(path, mmap=True):
+    """Load the pieces of a saved model; returns (df, tfidf, tfidf_matrix, manifest)"""
+    path = resolve_artifact_dir(path)
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format {manifest.get('format_version')} "
+            f"(expected {ARTIFACT_FORMAT_VERSION}) in '{path}'"
+        )
+
+    # Rebuild the vectorizer from its vocabulary (if any) and IDF weights; nothing is refit
+    vectorizer = manifest['vectorizer']
+    idf = np.load(os.path.join(path, 'idf.npy'))
+    if vectorizer.get('kind', 'tfidf') == 'hashing':
+        tfidf = make_vectorizer('hashing')
+        tfidf[0].set_params(n_features=vectorizer['n_features'])
+        tfidf[-1].idf_ = idf
+    else:
+        with open(os.path.join(path, 'terms.json'), encoding='utf-8') as f:
+            terms = json.load(f)
+        tfidf = make_vectorizer('tfidf')
+        tfidf.set_params(
+            vocabulary={term: i for i, term in enumerate(terms)},
+            stop_words=vectorizer['stop_words'],
+            max_features=vectorizer['max_features'],
+        )
+        tfidf.idf_ = idf
+
+    mmap_mode = 'r' if mmap else None
+    data = np.load(os.path.join(path, 'tfidf_data.npy'), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(path, 'tfidf_indices.npy'), mmap_mode=mmap_mode)
+    indptr = np.load(os.path.join(path, 'tfidf_indptr.npy'), mmap_mode=mmap_mode)
+    tfidf_matrix = csr_matrix(
+        (data, indices, indptr),
+        shape=(manifest['n_rows'], manifest['n_features']),
+        copy=False,
+    )
+    # Arrays were sorted before saving; flag it so scipy never tries to sort read-only pages
+    tfidf_matrix.has_sorted_indices = True
+
+    df = pd.DataFrame({
+        col: load_strings(os.path.join(path, f'meta_{col}'), manifest['n_rows'])
+        for col in METADATA_COLUMNS
+    })
+    return df, tfidf, tfidf_matrix, manifest
+
+if __name__ == "__main__":
+    import argparse
+    from recommender import AnimeRecommender
+
+    parser = argparse.ArgumentParser(description="Build a memory-mappable model artifact")
+    parser.add_argument('--data', default='anime_recommender/processed_anime_data.csv',
+                        help="Processed data produced by preprocessing.py")
+    parser.add_argument('--out', default='anime_recommender/model',
+                        help="Artifact root; each build goes into a versioned subdirectory")
+    args = parser.parse_args()
+
+    recommender = AnimeRecommender(args.data)
+    out_dir, manifest = build_artifact(recommender, args.out)
+    print(f"Artifact written to '{out_dir}' "
+          f"({manifest['n_rows']} rows, {manifest['nnz']} non-zeros)")
@@ -0,0 +1,103 @@
+import os
+import queue
+import threading
+import time
+from metrics import Histogram
+
+# How long the first request of a batch may wait for company, and the most
+# requests scored in one matrix product
+DEFAULT_MAX_WAIT_MS = 2.0
+DEFAULT_MAX_BATCH_SIZE = 32
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_DELAY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+class _Pending:
+    """One queued request and the slot its handler waits on"""
+
+    def __init__(self, kind, params):
+        self.kind = kind
+        self.params = params
+        self.enqueued = time.monotonic()
+        self.result = None
+        self.done = threading.Event()
+
+class MicroBatcher:
+    """Groups concurrent recommendation requests so they share one scoring pass.
+
+    Request handlers call submit() and block. A scheduler thread takes the
+    first queued request, keeps collecting for up to max_wait_ms or until
+    max_batch_size requests are waiting, then answers the whole group with
+    AnimeRecommender.recommend_batch (one sparse matrix product) and wakes
+    each handler with its own result. The thread starts on first use in each
+    process, so a batcher created before forking workers still works in them.
+    """
+
+    def __init__(self, recommender, max_wait_ms=DEFAULT_MAX_WAIT_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self.recommender = recommender
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_delays = Histogram(QUEUE_DELAY_BUCKETS_MS)
+        self._queue = queue.Queue()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_running(self):
+        """Start the scheduler thread if this process does not have one yet"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # Threads do not survive fork, so a child starts over with its own queue
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name='micro-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def submit(self, kind, **params):
+        """Queue a 'title', 'features' or 'profile' request and wait for its Recommendations result"""
+        self._ensure_running()
+        pending = _Pending(kind, params)
+        self._queue.put(pending)
+        pending.done.wait()
+        if isinstance(pending.result, Exception):
+            raise pending.result
+        return pending.result
+
+    def _collect(self):
+        """Block for the next request, then gather more until the wait or size limit is hit"""
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Scheduler loop: collect a batch, score it, fan the results back out"""
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            self.batch_sizes.observe(len(batch))
+            for pending in batch:
+                self.queue_delays.observe((started - pending.enqueued) * 1000)
+            try:
+                results = self.recommender.recommend_batch([(p.kind, p.params) for p in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for pending, result in zip(batch, results):
+                pending.result = result
+                pending.done.set()
+
+    def stats(self):
+        """Settings plus batch-size and queue-delay histograms"""
+        return {
+            'max_wait_ms': self.max_wait_ms,
+            'max_batch_size': self.max_batch_size,
+            'queued': self._queue.qsize(),
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_delay_ms': self.queue_delays.snapshot(),
+        }
@@ -0,0 +1,362 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import scipy
+import sklearn
+from sklearn.metrics.pairwise import cosine_similarity
+from recommender import LOAD_COLUMNS, AnimeRecommender
+from batching import DEFAULT_MAX_BATCH_SIZE
+from columnar import csv_to_columnar, read_columnar
+from preprocessing import columnar_path, format_mb, peak_memory_mb, resolve_processed_path
+from synthetic import CATALOG_SIZES, parse_size, write_catalog
+
+# Where generated catalogs are kept between runs
+DEFAULT_CATALOG_DIR = 'anime_recommender/bench_data'
+
+# Relative change that counts as a regression against a baseline
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+# Suite metrics compared against a baseline, and whether higher is better
+COMPARED_METRICS = {
+    'construction_s': False,
+    'title_p50_ms': False,
+    'title_p99_ms': False,
+    'features_p50_ms': False,
+    'features_p99_ms': False,
+    'batch_qps': True,
+    'peak_memory_mb': False,
+}
+
+def legacy_rank(recommender, idx, k):
+    """The original scoring path: cosine_similarity followed by a full argsort"""
+    sim_scores = cosine_similarity(recommender.tfidf_matrix[idx], recommender.tfidf_matrix).flatten()
+    top = sim_scores.argsort()[::-1][1:k + 1]
+    return top, sim_scores[top]
+
+def time_calls(fn, args_list):
+    """Call fn once per argument tuple and return per-call latencies in milliseconds"""
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def report(name, latencies):
+    """Print mean/p50/p99 for a set of latencies"""
+    print(f"{name:<28} mean {latencies.mean():8.3f} ms   "
+          f"p50 {np.percentile(latencies, 50):8.3f} ms   p99 {np.percentile(latencies, 99):8.3f} ms")
+
+def benchmark_scoring(recommender, num_queries=200, k=10, seed=0):
+    """Compare the legacy scoring path with the top-k engine and the batch API"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(recommender.df), size=min(num_queries, len(recommender.df)), replace=False)
+    titles = recommender.df['title'].iloc[rows].tolist()
+
+    print(f"\nScoring {len(rows)} queries against {recommender.tfidf_matrix.shape[0]} rows (k={k})")
+    print("-" * 60)
+    legacy = time_calls(lambda i: legacy_rank(recommender, i, k), [(i,) for i in rows])
+    engine = time_calls(
+        lambda i: recommender._rank(recommender.tfidf_matrix[i], k, exclude=[i]), [(i,) for i in rows]
+    )
+    report("cosine_similarity + argsort", legacy)
+    report("dot product + top-k", engine)
+    print(f"Per-query speedup: {legacy.mean() / engine.mean():.1f}x")
+
+    start = time.perf_counter()
+    recommender.get_recommendations_batch(titles, k)
+    batch_seconds = time.perf_counter() - start
+    loop_qps = len(rows) / (legacy.sum() / 1000)
+    batch_qps = len(rows) / batch_seconds
+    print(f"\nLegacy loop throughput:  {loop_qps:10.1f} queries/s")
+    print(f"Batched throughput:      {batch_qps:10.1f} queries/s ({batch_qps / loop_qps:.1f}x)")
+
+def process_peak_mb():
+    """Peak resident memory of this process image in MB, or None where it cannot be measured.
+
+    Linux carries ru_maxrss over from the parent when a process is spawned,
+    so VmHWM (which starts fresh with each exec) is preferred where available.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = peak_memory_mb()
+    return peak[0] if peak else None
+
+def _tags(value):
+    """Split a processed tag cell into a list (empty for missing cells)"""
+    return [t.strip() for t in str(value).split(',') if t.strip()] if isinstance(value, str) else []
+
+def measure_catalog(data_path, num_queries=200, k=10, lean=False, seed=0, rounds=3):
+    """Construction time, query latencies, batch throughput and peak memory for one catalog.
+
+    Caching is disabled so every query is scored. Feature queries reuse the
+    genres and themes of randomly chosen titles, so their mix follows the
+    catalog's own tag distribution. Each query's latency is its best of
+    rounds runs, which keeps scheduler noise out of the percentiles.
+    """
+    start = time.perf_counter()
+    recommender = AnimeRecommender(data_path, cache_size=0, lean=lean)
+    construction = time.perf_counter() - start
+
+    df = recommender.df
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(df), size=min(num_queries, len(df)), replace=False)
+    titles = df['title'].iloc[rows].tolist()
+    features = [
+        (_tags(g) or None, _tags(t) or None)
+        for g, t in zip(df['genres'].iloc[rows], df['themes'].iloc[rows])
+        if _tags(g) or _tags(t)
+    ]
+
+    # Build the lazily created indexes up front so the first query is not charged for them
+    recommender.get_recommendations(titles[0], k)
+    recommender.get_recommendations_by_features(*features[0], num_recommendations=k)
+
+    title_ms = np.min([
+        time_calls(lambda t: recommender.get_recommendations(t, k), [(t,) for t in titles])
+        for _ in range(rounds)
+    ], axis=0)
+    features_ms = np.min([
+        time_calls(
+            lambda g, t: recommender.get_recommendations_by_features(genres=g, themes=t, num_recommendations=k),
+            features,
+        )
+        for _ in range(rounds)
+    ], axis=0)
+
+    requests = [('title', {'title': t, 'num_recommendations': k}) for t in titles]
+    batch_seconds = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(0, len(requests), DEFAULT_MAX_BATCH_SIZE):
+            recommender.recommend_batch(requests[i:i + DEFAULT_MAX_BATCH_SIZE])
+        batch_seconds.append(time.perf_counter() - start)
+
+    return {
+        'rows': len(df),
+        'nnz': int(recommender.tfidf_matrix.nnz),
+        'construction_s': construction,
+        'title_p50_ms': float(np.percentile(title_ms, 50)),
+        'title_p99_ms': float(np.percentile(title_ms, 99)),
+        'title_mean_ms': float(title_ms.mean()),
+        'features_p50_ms': float(np.percentile(features_ms, 50)),
+        'features_p99_ms': float(np.percentile(features_ms, 99)),
+        'features_mean_ms': float(features_ms.mean()),
+        'batch_qps': len(requests) / min(batch_seconds),
+        'peak_memory_mb': process_peak_mb(),
+        'model_memory_mb': recommender.memory_report()['total'] / 2**20,
+    }
+
+def environment():
+    """Versions and hardware the suite ran on, stored with its results"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def print_result(name, result):
+    """One summary block for a measured catalog"""
+    print(f"\n{name}: {result['rows']} rows, {result['nnz']} non-zeros")
+    print("-" * 60)
+    print(f"{'construction':<28} {result['construction_s']:10.2f} s")
+    print(f"{'title query':<28} p50 {result['title_p50_ms']:8.3f} ms   p99 {result['title_p99_ms']:8.3f} ms")
+    print(f"{'feature query':<28} p50 {result['features_p50_ms']:8.3f} ms   p99 {result['features_p99_ms']:8.3f} ms")
+    print(f"{'batch throughput':<28} {result['batch_qps']:10.1f} queries/s")
+    print(f"{'peak memory':<28} {format_mb(result['peak_memory_mb']):>13} (model {result['model_memory_mb']:.1f} MB)")
+
+def run_suite(sizes=None, data_path=None, catalog_dir=DEFAULT_CATALOG_DIR, num_queries=200, k=10, lean=False, seed=0,
+              rounds=3):
+    """Measure synthetic catalogs of the given sizes (or the catalog at data_path).
+
+    Each catalog is measured in a fresh process so peak memory belongs to it
+    alone. Generated catalogs are cached in catalog_dir.
+    """
+    catalogs = {}
+    if sizes:
+        os.makedirs(catalog_dir, exist_ok=True)
+        for size in sizes:
+            n_rows = parse_size(size)
+            path = os.path.join(catalog_dir, f'synthetic_{n_rows}_seed{seed}.csv')
+            if not os.path.exists(path):
+                print(f"Generating {n_rows}-row synthetic catalog...")
+                write_catalog(path, n_rows, seed)
+            catalogs[size] = path
+    else:
+        catalogs[os.path.basename(data_path)] = data_path
+
+    results = {}
+    for name, path in catalogs.items():
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results[name] = pool.submit(measure_catalog, path, num_queries, k, lean, seed, rounds).result()
+        print_result(name, results[name])
+    return {
+        'environment': environment(),
+        'settings': {'queries': num_queries, 'k': k, 'lean': lean, 'seed': seed, 'rounds': rounds},
+        'results': results,
+    }
+
+def compare_to_baseline(suite, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Print each metric against the baseline; returns the regressions beyond threshold"""
+    regressions = []
+    print(f"\nComparison with baseline (threshold {threshold:.0%})")
+    print("-" * 60)
+    for name, result in suite['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            print(f"{name}: not in baseline, skipped")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in base or not base[metric] or result.get(metric) is None:
+                continue
+            change = result[metric] / base[metric] - 1
+            regressed = change < -threshold if higher_is_better else change > threshold
+            print(f"{name:<8} {metric:<18} {base[metric]:12.3f} -> {result[metric]:12.3f}  "
+                  f"{change:+7.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{name} {metric} {change:+.1%}")
+    return regressions
+
+def print_memory_report(recommender):
+    """Print the recommender's memory_report(), largest component first"""
+    report = recommender.memory_report()
+    total, mapped = report.pop('total'), report.pop('mapped')
+    print("\nMemory by component")
+    print("-" * 60)
+    for component, size in sorted(report.items(), key=lambda item: -item[1]):
+        print(f"{component:<28} {size / 2**20:10.2f} MB")
+    print(f"{'total':<28} {total / 2**20:10.2f} MB")
+    if mapped:
+        print(f"{'memory-mapped (shared)':<28} {mapped / 2**20:10.2f} MB")
+
+def benchmark_shards(recommender, shard_counts, num_queries=200, k=10, seed=0, rounds=3):
+    """Title-query latency with the matrix split into each number of shards.
+
+    Every shard count must return exactly the unsharded results; a mismatch
+    raises instead of being reported as a timing.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(recommender.df), size=min(num_queries, len(recommender.df)), replace=False)
+    queries = [(recommender.tfidf_matrix[i], [i]) for i in rows]
+
+    def rank_all():
+        return [recommender._rank(query, k, exclude=exclude) for query, exclude in queries]
+
+    recommender.sharded = None
+    expected = rank_all()
+    print(f"\nSharded title queries against {recommender.tfidf_matrix.shape[0]} rows (k={k}, {os.cpu_count()} CPUs)")
+    print("-" * 60)
+    for n_shards in shard_counts:
+        recommender.shard(n_shards)
+        for (indices, scores), (want_indices, want_scores) in zip(rank_all(), expected):
+            if not (np.array_equal(indices, want_indices) and np.array_equal(scores, want_scores)):
+                raise AssertionError(f"{n_shards} shards returned different results than the unsharded matrix")
+        latencies = np.min([
+            time_calls(lambda q, e: recommender._rank(q, k, exclude=e), queries) for _ in range(rounds)
+        ], axis=0)
+        report(f"{n_shards} shard(s)", latencies)
+    recommender.sharded = None
+
+def measure_load_formats(csv_path, rounds=3):
+    """Compare loading processed data from the CSV and from its columnar copy.
+
+    Data loads keep their best of rounds; each full startup (load plus fit)
+    runs once, the CSV one from a copy that has no columnar sibling.
+    """
+    columnar = columnar_path(csv_path)
+    if resolve_processed_path(csv_path) != columnar:
+        print(f"Writing columnar copy to '{columnar}'...")
+        csv_to_columnar(csv_path, columnar)
+
+    def best(fn):
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    result = {
+        'csv_all_columns_s': best(lambda: pd.read_csv(csv_path)),
+        'csv_serving_columns_s': best(lambda: pd.read_csv(csv_path, usecols=LOAD_COLUMNS)),
+        'columnar_serving_columns_s': best(lambda: read_columnar(columnar, LOAD_COLUMNS)),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_only = os.path.join(tmp, os.path.basename(csv_path))
+        shutil.copyfile(csv_path, csv_only)
+        for name, path in (('csv', csv_only), ('columnar', columnar)):
+            start = time.perf_counter()
+            AnimeRecommender(path)
+            result[f'{name}_startup_s'] = time.perf_counter() - start
+
+    print(f"\nLoading '{csv_path}'")
+    print("-" * 60)
+    for name, seconds in result.items():
+        print(f"{name:<28} {seconds:10.3f} s")
+    print(f"{'load speedup':<28} {result['csv_all_columns_s'] / result['columnar_serving_columns_s']:10.1f}x")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark recommendation scoring")
+    parser.add_argument('--data', default='anime_recommender/processed_anime_data.csv')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--lean', action='store_true', help="Use the memory-lean model (float32, no fitting text)")
+    parser.add_argument('--sizes', nargs='+',
+                        help=f"Run the suite on synthetic catalogs of these sizes ({', '.join(CATALOG_SIZES)} or a row count)")
+    parser.add_argument('--catalog-dir', default=DEFAULT_CATALOG_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rounds', type=int, default=3, help="Runs per query; each query keeps its best time")
+    parser.add_argument('--output', help="Write suite results to this JSON file")
+    parser.add_argument('--baseline', help="Suite results JSON to compare against; exits 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    parser.add_argument('--load-formats', action='store_true',
+                        help="Compare startup from the CSV at --data against its columnar copy")
+    parser.add_argument('--shards', type=int, nargs='+',
+                        help="Time title queries with the matrix split into each of these shard counts")
+    args = parser.parse_args()
+
+    if args.load_formats:
+        measure_load_formats(args.data, args.rounds)
+        sys.exit(0)
+
+    if args.shards:
+        benchmark_shards(AnimeRecommender(args.data, lean=args.lean), args.shards, args.queries, args.k, args.seed,
+                         args.rounds)
+        sys.exit(0)
+
+    if not (args.sizes or args.output or args.baseline):
+        recommender = AnimeRecommender(args.data, lean=args.lean)
+        benchmark_scoring(recommender, args.queries, args.k)
+        print_memory_report(recommender)
+        sys.exit(0)
+
+    suite = run_suite(args.sizes, args.data, args.catalog_dir, args.queries, args.k, args.lean, args.seed, args.rounds)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(suite, f, indent=2)
+        print(f"\nResults written to '{args.output}'")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(suite, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {'; '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Bump this whenever the on-disk layout changes so stale datasets are rejected
+COLUMNAR_FORMAT_VERSION = 1
+
+# Written last, so a directory without it holds no complete dataset
+SCHEMA_FILE = 'schema.json'
+
+def save_strings(path, values):
+    """Save a string column as one NUL-separated UTF-8 blob plus a null mask"""
+    values = pd.Series(values, dtype=object)
+    nulls = values.isna().to_numpy()
+    text = '\0'.join(values.where(~nulls, '').astype(str).tolist())
+    with open(path + '.txt', 'wb') as f:
+        f.write(text.encode('utf-8'))
+    np.save(path + '.nulls.npy', nulls)
+
+def load_strings(path, n_rows=None):
+    """Load a string column saved by save_strings (n_rows disambiguates an empty column)"""
+    if n_rows == 0:
+        return np.empty(0, dtype=object)
+    with open(path + '.txt', 'rb') as f:
+        values = np.array(f.read().decode('utf-8').split('\0'), dtype=object)
+    nulls = np.load(path + '.nulls.npy')
+    if nulls.any():
+        values[nulls] = np.nan
+    return values
+
+def is_columnar(path):
+    """Whether path is a complete columnar dataset directory"""
+    return os.path.isfile(os.path.join(path, SCHEMA_FILE))
+
+def read_schema(path):
+    """Schema of a columnar dataset, rejecting other format versions"""
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    if schema.get('format_version') != COLUMNAR_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported columnar format {schema.get('format_version')} "
+            f"(expected {COLUMNAR_FORMAT_VERSION}) in '{path}'"
+        )
+    return schema
+
+def read_columnar(path, columns=None):
+    """Load a columnar dataset as a DataFrame, reading only the requested columns (all if None)"""
+    schema = read_schema(path)
+    stored = [column['name'] for column in schema['columns']]
+    columns = stored if columns is None else list(columns)
+    missing = [c for c in columns if c not in stored]
+    if missing:
+        raise ValueError(f"Columns {missing} are not in '{path}' (it has {', '.join(stored)})")
+    return pd.DataFrame({c: load_strings(os.path.join(path, c), schema['n_rows']) for c in columns})
+
+class ColumnarWriter:
+    """Append DataFrame chunks to a columnar dataset, one blob and null mask per column.
+
+    Empty strings are stored as missing values, which is how they read back
+    from a CSV, so both formats load into the same frame.
+    """
+
+    def __init__(self, out_dir, columns):
+        self.out_dir = out_dir
+        self.columns = list(columns)
+        self.n_rows = 0
+        os.makedirs(out_dir, exist_ok=True)
+        schema_path = os.path.join(out_dir, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            os.remove(schema_path)
+        self._blobs = {c: open(os.path.join(out_dir, c + '.txt'), 'wb') for c in self.columns}
+        self._nulls = {c: [] for c in self.columns}
+
+    def append(self, chunk):
+        """Write the chunk's rows after those already written"""
+        if chunk.empty:
+            return
+        for column in self.columns:
+            values = chunk[column] if column in chunk.columns else pd.Series([np.nan] * len(chunk))
+            values = pd.Series(values.to_numpy(), dtype=object)
+            nulls = (values.isna() | (values == '')).to_numpy()
+            text = '\0'.join(values.where(~nulls, '').astype(str).tolist())
+            self._blobs[column].write((('\0' if self.n_rows else '') + text).encode('utf-8'))
+            self._nulls[column].append(nulls)
+        self.n_rows += len(chunk)
+
+    def close(self):
+        """Write the null masks and, last, the schema; returns the schema"""
+        for column in self.columns:
+            self._blobs[column].close()
+            nulls = np.concatenate(self._nulls[column]) if self._nulls[column] else np.zeros(0, dtype=bool)
+            np.save(os.path.join(self.out_dir, column + '.nulls.npy'), nulls)
+        schema = {
+            'format_version': COLUMNAR_FORMAT_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'n_rows': self.n_rows,
+            'columns': [{'name': c, 'type': 'string'} for c in self.columns],
+        }
+        with open(os.path.join(self.out_dir, SCHEMA_FILE), 'w') as f:
+            json.dump(schema, f, indent=2)
+        return schema
+
+def csv_to_columnar(csv_path, out_dir, chunksize=50000):
+    """Convert a processed CSV to a columnar dataset chunk by chunk; returns the schema"""
+    writer = None
+    for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunksize, keep_default_na=False):
+        if writer is None:
+            writer = ColumnarWriter(out_dir, chunk.columns)
+        writer.append(chunk)
+    return writer.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a processed CSV to the columnar format")
+    parser.add_argument('csv', nargs='?', default='anime_recommender/processed_anime_data.csv')
+    parser.add_argument('--out', help="Output directory (default: the CSV path without .csv)")
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.splitext(args.csv)[0]
+    schema = csv_to_columnar(args.csv, out_dir)
+    print(f"Wrote {schema['n_rows']} rows ({', '.join(c['name'] for c in schema['columns'])}) to '{out_dir}'")
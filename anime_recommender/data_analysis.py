@@ -1,26 +1,177 @@
-import pandas as pd
+import json
+import os
+import time
+from collections import Counter
 import numpy as np
+import pandas as pd
+from preprocessing import DEFAULT_CHUNKSIZE, RAW_DATA_PATH, RELEVANT_COLUMNS, format_mb, peak_memory_mb, process_chunk
+
+# Columns holding comma-separated tags, counted tag by tag
+TAG_COLUMNS = ['genres', 'themes', 'demographics']
+
+# Low-cardinality columns whose values are counted whole
+CATEGORICAL_COLUMNS = ['status', 'rating']
+
+# Synopsis word-count histogram edges; the last bin holds everything longer
+SYNOPSIS_BINS = [0, 25, 50, 75, 100, 150, 200, 300, 400, 600]
+
+# Most frequent terms kept in the report (candidates for extra stop words)
+TOP_TERMS = 50
+
+DEFAULT_REPORT_PATH = 'anime_recommender/data_profile.json'
+
+def file_fingerprint(path):
+    """Size and modification time, enough to tell whether a report is stale"""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+class DatasetProfile:
+    """Statistics of a raw dataset accumulated one chunk at a time.
+
+    Everything kept grows with the number of distinct columns, tags and terms,
+    never with the number of rows, so any file size profiles in bounded memory.
+    Terms are extracted from the combined features the pipeline builds, with
+    the same analyzer the recommender's vectorizer uses.
+    """
 
-# Load a sample of the data to understand its structure
-# Since the file is large, we'll read just the first 1000 rows for initial analysis
-df_sample = pd.read_csv('65k_anime_data.csv', nrows=1000)
+    def __init__(self, vectorizer):
+        self.analyzer = vectorizer.build_analyzer()
+        self.max_features = getattr(vectorizer, 'max_features', None)
+        self.rows = 0
+        self.rows_kept = 0
+        self.columns = []
+        self.nulls = Counter()
+        self.tags = {col: Counter() for col in TAG_COLUMNS}
+        self.values = {col: Counter() for col in CATEGORICAL_COLUMNS}
+        self.synopsis_words = np.zeros(len(SYNOPSIS_BINS), dtype=np.int64)
+        self.term_counts = Counter()
+        self.document_frequency = Counter()
+        self.vocabulary_growth = []
 
-print("Dataset shape:", df_sample.shape)
-print("\nColumn names:")
-print(df_sample.columns.tolist())
+    def update(self, chunk):
+        """Add one chunk of raw rows (read as strings) to the profile"""
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns.append(col)
+        self.rows += len(chunk)
+        self.nulls.update(chunk.isna().sum().to_dict())
 
-print("\nData types:")
-print(df_sample.dtypes)
+        for col in TAG_COLUMNS:
+            if col in chunk.columns:
+                self.tags[col].update(chunk[col].dropna().str.split(',').explode().str.strip().value_counts().to_dict())
+        for col in CATEGORICAL_COLUMNS:
+            if col in chunk.columns:
+                self.values[col].update(chunk[col].value_counts().to_dict())
+        if 'synopsis' in chunk.columns:
+            words = chunk['synopsis'].dropna().str.split().str.len().to_numpy()
+            bins = np.searchsorted(SYNOPSIS_BINS, words, side='right') - 1
+            self.synopsis_words += np.bincount(bins, minlength=len(SYNOPSIS_BINS))
 
-print("\nFirst few rows:")
-print(df_sample.head())
+        if all(col in chunk.columns for col in RELEVANT_COLUMNS):
+            processed = process_chunk(chunk)
+            self.rows_kept += len(processed)
+            for document in processed['combined_features']:
+                terms = self.analyzer(document)
+                self.term_counts.update(terms)
+                self.document_frequency.update(set(terms))
+        self.vocabulary_growth.append([self.rows, len(self.term_counts)])
 
-print("\nMissing values:")
-print(df_sample.isnull().sum())
+    def report(self, top_terms=TOP_TERMS):
+        """JSON-serializable summary of everything seen so far"""
+        total_terms = sum(self.term_counts.values())
+        kept_terms = self.term_counts.most_common(self.max_features)
+        labels = [f"{a}-{b - 1}" for a, b in zip(SYNOPSIS_BINS[:-1], SYNOPSIS_BINS[1:])] + [f"{SYNOPSIS_BINS[-1]}+"]
+        return {
+            'rows': self.rows,
+            'rows_kept': self.rows_kept,
+            'columns': self.columns,
+            'null_rates': {col: self.nulls[col] / self.rows if self.rows else 0.0 for col in self.columns},
+            'tags': {col: dict(counts.most_common()) for col, counts in self.tags.items() if counts},
+            'values': {col: dict(counts.most_common()) for col, counts in self.values.items() if counts},
+            'synopsis_words': dict(zip(labels, self.synopsis_words.tolist())),
+            'vocabulary': {
+                'size': len(self.term_counts),
+                'in_one_document': sum(1 for df in self.document_frequency.values() if df == 1),
+                'max_features': self.max_features,
+                # Share of term occurrences the vectorizer's max_features vocabulary keeps
+                'max_features_coverage': sum(n for _, n in kept_terms) / total_terms if total_terms else 0.0,
+                'growth': self.vocabulary_growth,
+                'top_terms': {
+                    term: df / self.rows_kept for term, df in self.document_frequency.most_common(top_terms)
+                },
+            },
+        }
 
-print("\nUnique values in categorical columns:")
-categorical_columns = ['status', 'rating', 'genres', 'themes', 'demographics']
-for col in categorical_columns:
-    if col in df_sample.columns:
+def profile_dataset(path=RAW_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Profile a raw dataset in one chunked pass; returns the report"""
+    from recommender import make_vectorizer
+
+    profile = DatasetProfile(make_vectorizer())
+    chunks = pd.read_csv(path, dtype=str, chunksize=chunksize, encoding='utf-8', encoding_errors='ignore')
+    start = time.perf_counter()
+    for chunk in chunks:
+        profile.update(chunk)
+        print(f"  {profile.rows} rows profiled ({profile.rows / (time.perf_counter() - start):.0f} rows/s)", end='\r')
+    print()
+    report = profile.report()
+    report['source'] = file_fingerprint(path)
+    report['seconds'] = time.perf_counter() - start
+    peak = peak_memory_mb()
+    report['peak_memory_mb'] = peak[0] if peak else None
+    return report
+
+def print_profile(report, top=10):
+    """Readable summary of a profile report"""
+    print(f"Rows: {report['rows']} ({report['rows_kept']} kept by preprocessing), columns: {len(report['columns'])}")
+
+    print("\nMissing values:")
+    for col, rate in sorted(report['null_rates'].items(), key=lambda item: -item[1]):
+        print(f"  {col:<24} {rate:7.1%}")
+
+    for col, counts in report['tags'].items():
+        print(f"\n{col} ({len(counts)} distinct tags):")
+        for tag, n in list(counts.items())[:top]:
+            print(f"  {tag:<24} {n:8d}")
+    for col, counts in report['values'].items():
         print(f"\n{col}:")
-        print(df_sample[col].value_counts().head())
\ No newline at end of file
+        for value, n in list(counts.items())[:top]:
+            print(f"  {value:<36} {n:8d}")
+
+    print("\nSynopsis length (words):")
+    for label, n in report['synopsis_words'].items():
+        print(f"  {label:<10} {n:8d}")
+
+    vocabulary = report['vocabulary']
+    print(f"\nVocabulary: {vocabulary['size']} terms ({vocabulary['in_one_document']} in a single document)")
+    print(f"  max_features={vocabulary['max_features']} keeps {vocabulary['max_features_coverage']:.1%} of term occurrences")
+    print("  growth: " + ', '.join(f"{rows} rows -> {size}" for rows, size in vocabulary['growth'][-top:]))
+    print("  most common terms (share of documents): "
+          + ', '.join(f"{term} {share:.0%}" for term, share in list(vocabulary['top_terms'].items())[:top]))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile the full raw dataset in one streaming pass")
+    parser.add_argument('--input', default=RAW_DATA_PATH)
+    parser.add_argument('--output', default=DEFAULT_REPORT_PATH, help="Where the JSON report is written")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--force', action='store_true', help="Re-profile even if the report matches the input file")
+    args = parser.parse_args()
+
+    report = None
+    if not args.force and os.path.exists(args.output):
+        with open(args.output) as f:
+            report = json.load(f)
+        if report.get('source') != file_fingerprint(args.input):
+            report = None
+        else:
+            print(f"Report '{args.output}' is up to date with '{args.input}'")
+    if report is None:
+        print(f"Profiling '{args.input}' in chunks of {args.chunksize} rows...")
+        report = profile_dataset(args.input, args.chunksize)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Profiled in {report['seconds']:.2f}s (peak memory {format_mb(report['peak_memory_mb'])}); "
+              f"report written to '{args.output}'")
+    print()
+    print_profile(report)
@@ -0,0 +1,156 @@
+import time
+import numpy as np
+from scoring import top_k
+
+DEFAULT_COMPONENTS = 256
+
+# Inverted lists probed per query; the main recall/latency knob
+DEFAULT_PROBES = 8
+
+# Spherical k-means settings for the coarse quantizer
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+ASSIGN_BLOCK_SIZE = 8192
+
+def _normalize(vectors):
+    """L2-normalize rows in place (zero rows stay zero) and return them"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    vectors /= norms
+    return vectors
+
+def _assign(vectors, centroids):
+    """Index of the most similar centroid for each vector, computed in blocks"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_SIZE):
+        block = vectors[start:start + ASSIGN_BLOCK_SIZE]
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+def spherical_kmeans(vectors, n_clusters, n_iter=KMEANS_ITERATIONS, seed=0):
+    """Cluster unit vectors by cosine similarity; returns unit-norm centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=n_clusters)
+        # Re-seed empty clusters from random points so every list stays in use
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+class EmbeddingIndex:
+    """Low-rank float32 embeddings of the TF-IDF matrix with an IVF nearest-neighbour index.
+
+    Rows are projected to n_components dimensions (TruncatedSVD or sparse
+    random projection) and normalized, then bucketed by a spherical k-means
+    coarse quantizer. A query only scores the rows in the n_probe lists whose
+    centroids are closest to it, so recall and latency both grow with n_probe.
+    """
+
+    def __init__(self, tfidf_matrix, n_components=DEFAULT_COMPONENTS, method='svd', n_lists=None, seed=0):
+        n_rows = tfidf_matrix.shape[0]
+        n_components = min(n_components, tfidf_matrix.shape[1] - 1, n_rows - 1)
+        if method == 'svd':
+            from sklearn.decomposition import TruncatedSVD
+            self.projection = TruncatedSVD(n_components=n_components, random_state=seed)
+        elif method == 'random':
+            from sklearn.random_projection import SparseRandomProjection
+            self.projection = SparseRandomProjection(n_components=n_components, dense_output=True, random_state=seed)
+        else:
+            raise ValueError(f"Unknown projection '{method}' (expected 'svd' or 'random')")
+        self.method = method
+        self.vectors = _normalize(self.projection.fit_transform(tfidf_matrix).astype(np.float32))
+
+        # Roughly sqrt(N) lists keeps both the centroid scan and the probed lists small
+        rng = np.random.default_rng(seed)
+        sample = self.vectors
+        if n_rows > KMEANS_SAMPLE:
+            sample = self.vectors[rng.choice(n_rows, KMEANS_SAMPLE, replace=False)]
+        self.n_lists = min(n_lists or max(1, int(np.sqrt(n_rows))), len(sample))
+        self.centroids = spherical_kmeans(sample, self.n_lists, seed=seed)
+        self._build_lists(_assign(self.vectors, self.centroids))
+
+    def _build_lists(self, labels):
+        """Group row ids by list so each list is one contiguous slice"""
+        self.labels = labels
+        self.list_rows = np.argsort(labels, kind='stable').astype(np.int64)
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.n_lists))])
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def project(self, query_vectors):
+        """Project sparse TF-IDF rows into the embedding space"""
+        return _normalize(self.projection.transform(query_vectors).astype(np.float32))
+
+    def add(self, tfidf_rows):
+        """Append embeddings for newly added catalog rows and file them into their lists"""
+        vectors = self.project(tfidf_rows)
+        self.vectors = np.vstack([self.vectors, vectors])
+        self._build_lists(np.concatenate([self.labels, _assign(vectors, self.centroids)]))
+
+    def search(self, query, k, n_probe=DEFAULT_PROBES, exclude=None):
+        """Approximate top-k rows for one embedded query; returns (indices, scores)"""
+        n_probe = min(n_probe, self.n_lists)
+        probed = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        candidates = np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed
+        ])
+        scores = (self.vectors[candidates] @ query).astype(np.float64)
+        if exclude is not None and len(exclude):
+            scores[np.isin(candidates, exclude)] = -np.inf
+        top = top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return candidates[top], scores[top]
+
+def recall_at_k(recommender, k=10, n_queries=200, n_probes=(1, 4, DEFAULT_PROBES, 32), seed=0):
+    """Recall@k and mean latency of the ANN engine against exact sparse scoring for title queries"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(recommender.df), size=min(n_queries, len(recommender.df)), replace=False)
+    index = recommender.embedding_index
+
+    exact = {}
+    start = time.perf_counter()
+    for row in rows:
+        exact[row] = set(recommender._rank(recommender.tfidf_matrix[row], k, exclude=[row])[0].tolist())
+    report = [{'engine': 'sparse', 'n_probe': None, 'recall': 1.0,
+               'latency_ms': (time.perf_counter() - start) / len(rows) * 1000}]
+
+    for n_probe in n_probes:
+        hits = 0
+        start = time.perf_counter()
+        for row in rows:
+            found, _ = index.search(index.vectors[row], k, n_probe, exclude=[row])
+            hits += len(exact[row].intersection(found.tolist()))
+        elapsed = time.perf_counter() - start
+        report.append({'engine': 'ann', 'n_probe': n_probe, 'recall': hits / (k * len(rows)),
+                       'latency_ms': elapsed / len(rows) * 1000})
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    from recommender import AnimeRecommender
+
+    parser = argparse.ArgumentParser(description="Recall@k of the ANN engine against exact sparse scoring")
+    parser.add_argument('--data', default='anime_recommender/processed_anime_data.csv')
+    parser.add_argument('--components', type=int, default=DEFAULT_COMPONENTS)
+    parser.add_argument('--method', choices=['svd', 'random'], default='svd')
+    parser.add_argument('--lists', type=int, default=None)
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, DEFAULT_PROBES, 32])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    recommender = AnimeRecommender(args.data)
+    start = time.perf_counter()
+    recommender.build_embedding_index(args.components, args.method, args.lists)
+    print(f"Built {args.method} embedding index in {time.perf_counter() - start:.1f}s")
+
+    print(f"\n{'engine':<8} {'n_probe':>8} {'recall@' + str(args.k):>10} {'latency':>12}")
+    for row in recall_at_k(recommender, args.k, args.queries, args.probes):
+        n_probe = '-' if row['n_probe'] is None else row['n_probe']
+        print(f"{row['engine']:<8} {n_probe:>8} {row['recall']:>10.3f} {row['latency_ms']:>9.3f} ms")
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+FACET_COLUMNS = ['genres', 'themes', 'demographics']
+
+# Single-valued columns indexed like the facets so they can filter and be counted
+ATTRIBUTE_COLUMNS = ['rating']
+INDEXED_COLUMNS = FACET_COLUMNS + ATTRIBUTE_COLUMNS
+
+# Distinct filter combinations whose row masks are kept for reuse
+FILTER_MASK_CACHE_SIZE = 256
+
+def filter_value(column, value):
+    """Canonical form of a tag or attribute value as stored in the index.
+
+    Tags are lowercased. Attribute values are reduced to the lowercased code
+    before ' - ', so 'Rx - Hentai' and 'rx' name the same rating.
+    """
+    value = str(value).strip()
+    if column in ATTRIBUTE_COLUMNS:
+        value = value.split(' - ', 1)[0].strip()
+    return value.lower()
+
+class FacetIndex:
+    """Exact tag filtering over the genres, themes and demographics columns.
+
+    Each facet is stored as a boolean row-by-tag incidence matrix. Its CSC
+    form gives every tag's posting list (sorted row ids). AND/OR/NOT queries
+    combine posting lists into a row mask. Facet counts for any subset are
+    one sparse product with that mask. Attribute columns such as rating are
+    indexed the same way, with one value per row.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.tags = {}
+        self.tag_ids = {}
+        self.incidence = {}
+        self._postings = {}
+        self._filter_masks = {}
+        for facet in INDEXED_COLUMNS:
+            values = df[facet] if facet in df.columns else pd.Series([''] * len(df))
+            values = pd.Series(values.fillna('').astype(str).to_numpy())
+            if facet in ATTRIBUTE_COLUMNS:
+                exploded = values.map(lambda v: filter_value(facet, v))
+            else:
+                # One entry per (row, tag): "action, award winning" -> "action", "award winning"
+                exploded = values.str.split(',').explode().str.strip()
+            exploded = exploded[exploded != '']
+            codes, tags = pd.factorize(exploded, sort=True)
+            rows = exploded.index.to_numpy()
+            incidence = csr_matrix(
+                (np.ones(len(rows), dtype=bool), (rows, codes)), shape=(self.n_rows, len(tags))
+            )
+            self.tags[facet] = [str(t) for t in tags]
+            self.tag_ids[facet] = {t: i for i, t in enumerate(self.tags[facet])}
+            self.incidence[facet] = incidence
+            self._postings[facet] = incidence.tocsc()
+
+    def postings(self, facet, tag):
+        """Sorted row ids carrying tag in facet (empty if the tag is unknown)"""
+        if facet not in self.tag_ids:
+            raise ValueError(f"Unknown filter column '{facet}' (expected one of {', '.join(INDEXED_COLUMNS)})")
+        tag_id = self.tag_ids[facet].get(filter_value(facet, tag))
+        if tag_id is None:
+            return np.empty(0, dtype=np.int32)
+        postings = self._postings[facet]
+        return postings.indices[postings.indptr[tag_id]:postings.indptr[tag_id + 1]]
+
+    def knows(self, facet, tag):
+        """Whether any row carries tag in facet"""
+        return filter_value(facet, tag) in self.tag_ids[facet]
+
+    def mask(self, any_of=None, all_of=None, none_of=None, one_of_each=None):
+        """Boolean row mask for a query; each argument maps facet -> tags.
+
+        Rows must carry at least one tag from any_of (when given), every tag in
+        all_of, no tag in none_of and, for every facet in one_of_each, at least
+        one of its tags.
+        """
+        mask = np.ones(self.n_rows, dtype=bool)
+        if any_of:
+            matched = np.zeros(self.n_rows, dtype=bool)
+            for facet, tags in any_of.items():
+                for tag in tags or ():
+                    matched[self.postings(facet, tag)] = True
+            mask &= matched
+        for facet, tags in (all_of or {}).items():
+            for tag in tags or ():
+                required = np.zeros(self.n_rows, dtype=bool)
+                required[self.postings(facet, tag)] = True
+                mask &= required
+        for facet, tags in (one_of_each or {}).items():
+            allowed = np.zeros(self.n_rows, dtype=bool)
+            for tag in tags or ():
+                allowed[self.postings(facet, tag)] = True
+            mask &= allowed
+        for facet, tags in (none_of or {}).items():
+            for tag in tags or ():
+                mask[self.postings(facet, tag)] = False
+        return mask
+
+    def filter_mask(self, filters=None, exclude=None):
+        """Read-only row mask for canonical filters and exclusions (column -> sorted values), built once per combination"""
+        key = (tuple((c, tuple(v)) for c, v in sorted((filters or {}).items())),
+               tuple((c, tuple(v)) for c, v in sorted((exclude or {}).items())))
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = self.mask(one_of_each=filters, none_of=exclude)
+            mask.flags.writeable = False
+            if len(self._filter_masks) >= FILTER_MASK_CACHE_SIZE:
+                self._filter_masks.pop(next(iter(self._filter_masks)))
+            self._filter_masks[key] = mask
+        return mask
+
+    def counts(self, mask=None):
+        """Per-facet (and per-attribute) value counts over the rows selected by mask (all rows if None)"""
+        counts = {}
+        for facet in INDEXED_COLUMNS:
+            incidence = self.incidence[facet]
+            if mask is None:
+                totals = np.diff(self._postings[facet].indptr)
+            else:
+                totals = incidence.T.astype(np.int32) @ mask.astype(np.int32)
+            counts[facet] = {tag: int(n) for tag, n in zip(self.tags[facet], totals) if n}
+        return counts
@@ -62,7 +62,7 @@ def get_anime_recommendations(recommender):
         num_recs = 10
     
     print(f"\nFinding recommendations for '{anime_title}'...")
-    recommendations = recommender.get_recommendations(anime_title, num_recs)
+    recommendations = recommender.get_recommendations(anime_title, num_recs, as_frame=True)
     
     if not recommendations.empty:
         print(f"\nTop {len(recommendations)} recommendations:")
@@ -106,7 +106,8 @@ def get_genre_recommendations(recommender):
     print(f"\nFinding recommendations for genres: {', '.join(genres)}...")
     recommendations = recommender.get_recommendations_by_features(
         genres=genres, 
-        num_recommendations=num_recs
+        num_recommendations=num_recs,
+        as_frame=True
     )
     
     if not recommendations.empty:
@@ -151,7 +152,8 @@ def get_theme_recommendations(recommender):
     print(f"\nFinding recommendations for themes: {', '.join(themes)}...")
     recommendations = recommender.get_recommendations_by_features(
         themes=themes, 
-        num_recommendations=num_recs
+        num_recommendations=num_recs,
+        as_frame=True
     )
     
     if not recommendations.empty:
@@ -194,7 +196,8 @@ def get_demographic_recommendations(recommender):
     print(f"\nFinding recommendations for demographic: {demographic}...")
     recommendations = recommender.get_recommendations_by_features(
         demographics=[demographic], 
-        num_recommendations=num_recs
+        num_recommendations=num_recs,
+        as_frame=True
     )
     
     if not recommendations.empty:
@@ -247,7 +250,8 @@ def get_feature_recommendations(recommender):
         genres=genres,
         themes=themes,
         demographics=[demographic] if demographic else None,
-        num_recommendations=num_recs
+        num_recommendations=num_recs,
+        as_frame=True
     )
     
     if not recommendations.empty:
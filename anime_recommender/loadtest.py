@@ -0,0 +1,309 @@
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import numpy as np
+
+# Share of each request kind in the default mix: title lookups, feature
+# (genre browse) queries like the front page's, and title list pages
+DEFAULT_MIX = {'title': 60, 'features': 25, 'list': 15}
+
+DEFAULT_CLIENTS = 8
+DEFAULT_DURATION = 10.0
+
+# Requests generated per client before its sequence repeats
+WORKLOAD_SIZE = 2000
+
+# Zipf exponent of title popularity; a few titles get most of the traffic
+TITLE_SKEW = 1.1
+
+# Results per query, and titles per list page, as the web interface asks for
+NUM_RECOMMENDATIONS = 12
+LIST_PAGE_SIZE = 50
+
+# Share of list requests that fetch the full title list instead of a prefix page
+FULL_LIST_SHARE = 0.1
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+REQUEST_HEADERS = {**JSON_HEADERS, 'Accept-Encoding': 'gzip'}
+
+SERVE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+
+class FlaskTarget:
+    """Sends requests to a Flask app in this process through its test client.
+
+    Client threads share the interpreter with the app, so this measures the
+    handlers and model without a network stack, but also without real
+    parallelism.
+    """
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self.name = 'in-process'
+
+    def connect(self):
+        """A send(method, path, body, headers) -> (status, body) function for one client"""
+        client = self.app.test_client()
+
+        def send(method, path, body=None, headers=REQUEST_HEADERS):
+            response = client.open(path, method=method, data=body, headers=headers)
+            return response.status_code, response.get_data()
+        return send
+
+class HttpTarget:
+    """Sends requests to a running server over HTTP, one keep-alive connection per client"""
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.name = f'http://{self.host}:{self.port}'
+
+    def connect(self):
+        """A send(method, path, body, headers) -> (status, body) function for one client"""
+        connection = None
+
+        def send(method, path, body=None, headers=REQUEST_HEADERS):
+            nonlocal connection
+            # A kept-alive connection the server already closed gets one retry on a fresh one
+            for attempt in range(2):
+                reused = connection is not None
+                if connection is None:
+                    connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                try:
+                    connection.request(method, path, body, headers)
+                    response = connection.getresponse()
+                    return response.status, response.read()
+                except (http.client.HTTPException, OSError):
+                    connection.close()
+                    connection = None
+                    if not reused or attempt:
+                        raise
+        return send
+
+def parse_mix(text):
+    """Request mix from 'title=60,features=25,list=15' (weights need not sum to 100)"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown request kind '{kind}' (expected one of {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("The request mix needs at least one positive weight")
+    return mix
+
+def wait_until_ready(send, timeout=600):
+    """Poll /readyz until the model is loaded (servers without it count as ready once they answer)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            status, _ = send('GET', '/readyz', headers=JSON_HEADERS)
+            if status in (200, 404):
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError("The server did not become ready in time")
+        time.sleep(0.5)
+
+def discover_catalog(send):
+    """Titles and genre counts the workload is drawn from, read through the API itself"""
+    status, body = send('GET', '/anime_list', headers=JSON_HEADERS)
+    if status != 200:
+        raise RuntimeError(f"/anime_list answered {status}")
+    titles = [t for t in json.loads(body)['anime_titles'] if isinstance(t, str) and t]
+    status, body = send('GET', '/facets', headers=JSON_HEADERS)
+    genres = json.loads(body)['facets']['genres'] if status == 200 else {'action': 1}
+    return titles, genres
+
+def build_workload(titles, genres, mix, n_requests=WORKLOAD_SIZE, seed=0):
+    """A reproducible sequence of (kind, method, path, body) requests with popularity skew.
+
+    Titles follow a Zipf distribution over a seeded shuffle of the catalog.
+    Feature queries browse one genre, picked in proportion to how many
+    titles carry it. List requests fetch a prefix page of a popular title's
+    first letters or, now and then, the full list.
+    """
+    rng = np.random.default_rng(seed)
+    kinds = list(mix)
+    kind_weights = np.array([mix[k] for k in kinds], dtype=float)
+    popularity = 1.0 / np.arange(1, len(titles) + 1) ** TITLE_SKEW
+    ranked = [titles[i] for i in rng.permutation(len(titles))]
+    genre_names = list(genres)
+    genre_weights = np.array([genres[g] for g in genre_names], dtype=float)
+    picked_kinds = rng.choice(kinds, size=n_requests, p=kind_weights / kind_weights.sum())
+    picked_titles = rng.choice(len(ranked), size=n_requests, p=popularity / popularity.sum())
+    picked_genres = rng.choice(len(genre_names), size=n_requests, p=genre_weights / genre_weights.sum())
+    full_lists = rng.random(n_requests) < FULL_LIST_SHARE
+
+    workload = []
+    for kind, title, genre, full_list in zip(picked_kinds, picked_titles, picked_genres, full_lists):
+        title = ranked[title]
+        if kind == 'title':
+            body = {'type': 'anime', 'anime_title': title, 'num_recommendations': NUM_RECOMMENDATIONS}
+            workload.append(('title', 'POST', '/recommend', json.dumps(body).encode('utf-8')))
+        elif kind == 'features':
+            body = {'type': 'features', 'genres': [genre_names[genre]],
+                    'num_recommendations': NUM_RECOMMENDATIONS}
+            workload.append(('features', 'POST', '/recommend', json.dumps(body).encode('utf-8')))
+        elif full_list:
+            workload.append(('list', 'GET', '/anime_list', None))
+        else:
+            query = urllib.parse.urlencode({'prefix': title[:2], 'limit': LIST_PAGE_SIZE})
+            workload.append(('list', 'GET', f'/anime_list?{query}', None))
+    return workload
+
+def run_load(target, workloads, duration=DEFAULT_DURATION, max_requests=None):
+    """Drive one client thread per workload until duration elapses or max_requests are sent.
+
+    Each client is closed-loop: it sends its next request as soon as the
+    previous one is answered. Returns ([(kind, latency_ms, status)], seconds);
+    status is None for a request that failed without a response.
+    """
+    records = []
+    lock = threading.Lock()
+    quota = None if max_requests is None else -(-max_requests // len(workloads))
+    start = time.monotonic()
+    deadline = start + duration
+
+    def client(workload):
+        send = target.connect()
+        local = []
+        i = 0
+        while time.monotonic() < deadline and (quota is None or i < quota):
+            kind, method, path, body = workload[i % len(workload)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                status, _ = send(method, path, body)
+            except Exception:
+                status = None
+            local.append((kind, (time.perf_counter() - started) * 1000, status))
+        with lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=client, args=(w,), daemon=True) for w in workloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, time.monotonic() - start
+
+def summarize(records, seconds):
+    """Throughput, latency percentiles and error rate per request kind and overall"""
+    summary = {}
+    for kind in list(DEFAULT_MIX) + ['all']:
+        selected = [r for r in records if kind == 'all' or r[0] == kind]
+        if not selected:
+            continue
+        latencies = np.array([r[1] for r in selected])
+        errors = sum(1 for r in selected if r[2] is None or r[2] >= 400)
+        summary[kind] = {
+            'requests': len(selected),
+            'errors': errors,
+            'error_rate': errors / len(selected),
+            'rps': len(selected) / seconds,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+        }
+    return summary
+
+def print_summary(name, summary):
+    print(f"\n{name}")
+    print("-" * 84)
+    print(f"{'kind':<10} {'requests':>9} {'errors':>7} {'error %':>8} {'req/s':>9} "
+          f"{'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for kind, row in summary.items():
+        print(f"{kind:<10} {row['requests']:>9} {row['errors']:>7} {row['error_rate'] * 100:>7.2f}% "
+              f"{row['rps']:>9.1f} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f} {row['p99_ms']:>10.2f}")
+
+def start_server(artifact_root, workers, port=0):
+    """Launch serve.py and return (process, url) once it is accepting connections"""
+    proc = subprocess.Popen(
+        [sys.executable, SERVE_SCRIPT, '--artifact', artifact_root, '--workers', str(workers), '--port', str(port)],
+        # The per-request access log goes to stderr and would drown out the report
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    for line in proc.stdout:
+        if line.startswith('Serving on'):
+            # Keep draining the server's output so it never blocks on a full pipe
+            threading.Thread(target=proc.stdout.read, daemon=True).start()
+            return proc, line.split()[2].rstrip('/')
+    raise RuntimeError("serve.py exited before it started serving")
+
+def measure(target, mix, clients=DEFAULT_CLIENTS, duration=DEFAULT_DURATION, max_requests=None, seed=0):
+    """Wait for target, build one workload per client from its catalog, run the load and summarize it"""
+    send = target.connect()
+    wait_until_ready(send)
+    titles, genres = discover_catalog(send)
+    workloads = [build_workload(titles, genres, mix, seed=seed + i) for i in range(clients)]
+    print(f"Driving {target.name} with {clients} clients for {duration:g}s "
+          f"({len(titles)} titles, mix {', '.join(f'{k}={v:g}' for k, v in mix.items())})...")
+    records, seconds = run_load(target, workloads, duration, max_requests)
+    return summarize(records, seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the recommendation API with a skewed request mix")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--url', help="Drive an already running server (e.g. http://127.0.0.1:5000)")
+    mode.add_argument('--serve', action='store_true',
+                      help="Start serve.py locally for each --workers value and drive it over HTTP")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help="Worker counts to compare with --serve")
+    parser.add_argument('--artifact', default='anime_recommender/model',
+                        help="Artifact root for --serve (built from --data if empty), or to load in-process")
+    parser.add_argument('--data', default='anime_recommender/processed_anime_data.csv')
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS, help="Concurrent closed-loop clients")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Seconds per run")
+    parser.add_argument('--requests', type=int, help="Stop each run after this many requests")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="Request kind weights, e.g. title=60,features=25,list=15")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the settings and results as JSON to this path")
+    args = parser.parse_args()
+
+    runs = {}
+    if args.url:
+        target = HttpTarget(args.url)
+        runs[target.name] = measure(target, args.mix, args.clients, args.duration, args.requests, args.seed)
+        print_summary(target.name, runs[target.name])
+    elif args.serve:
+        from serve import prepare_artifact
+
+        artifact_root = prepare_artifact(args.artifact, args.data)
+        for workers in args.workers:
+            proc, url = start_server(artifact_root, workers)
+            try:
+                name = f'serve.py --workers {workers}'
+                runs[name] = measure(HttpTarget(url), args.mix, args.clients, args.duration, args.requests, args.seed)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            print_summary(name, runs[name])
+    else:
+        from artifact import resolve_artifact_dir
+
+        # Serve the artifact when one exists; otherwise app.py fits its default data
+        if os.path.exists(os.path.join(resolve_artifact_dir(args.artifact), 'manifest.json')):
+            os.environ['ANIME_MODEL_ARTIFACT'] = args.artifact
+        import app
+
+        target = FlaskTarget(app.app)
+        runs[target.name] = measure(target, args.mix, args.clients, args.duration, args.requests, args.seed)
+        print_summary(target.name, runs[target.name])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'settings': {'clients': args.clients, 'duration': args.duration, 'requests': args.requests,
+                             'mix': args.mix, 'seed': args.seed},
+                'runs': runs,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
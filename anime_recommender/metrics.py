@@ -0,0 +1,150 @@
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds (seconds) for stage and request latency histograms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+                   2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """Thread-safe counts of observations per upper bucket bound, plus their count and sum"""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record one observation in the first bucket whose bound is >= value"""
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        """Bucket counts keyed by upper bound ('+Inf' for the overflow bucket), with count and mean"""
+        with self._lock:
+            buckets = {str(bound): n for bound, n in zip(self.bounds, self.counts)}
+            buckets['+Inf'] = self.counts[-1]
+            return {
+                'buckets': buckets,
+                'count': self.count,
+                'mean': self.sum / self.count if self.count else 0.0,
+            }
+
+    def cumulative(self):
+        """(bounds, cumulative counts per bound plus +Inf, count, sum), read consistently"""
+        with self._lock:
+            running, cumulative = 0, []
+            for n in self.counts:
+                running += n
+                cumulative.append(running)
+            return self.bounds, cumulative, self.count, self.sum
+
+class Counter:
+    """Thread-safe counts keyed by a tuple of label values"""
+
+    def __init__(self):
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def items(self):
+        with self._lock:
+            return sorted(self.values.items())
+
+class _NullStage:
+    """Stand-in timer used while timing is disabled; entering and leaving it does nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class StageMetrics:
+    """Switchable per-stage latency histograms.
+
+    Code wraps each stage in `with stage_metrics.time('name'):`. While
+    disabled that hands back one shared no-op object, so the hooks cost a
+    method call and nothing is recorded.
+    """
+
+    def __init__(self, enabled=False, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def time(self, stage):
+        """Context manager that records how long its block takes under stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+# Process-wide stage timings; ANIME_STAGE_TIMING=1 turns them on at startup
+stage_metrics = StageMetrics(enabled=os.environ.get('ANIME_STAGE_TIMING', '') == '1')
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values)) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def prometheus_metric(name, kind, help_text, samples, label_names=()):
+    """Prometheus text lines for a counter or gauge; samples is a list of (label values, value)"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for values, value in samples:
+        lines.append(f'{name}{_labels(label_names, values)} {_number(value)}')
+    return lines
+
+def prometheus_histogram(name, help_text, histograms, label_names=()):
+    """Prometheus text lines for histograms keyed by their label values"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for values, histogram in histograms:
+        bounds, cumulative, count, total = histogram.cumulative()
+        for bound, n in zip(list(bounds) + [float('inf')], cumulative):
+            labels = _labels(tuple(label_names) + ('le',), tuple(values) + (_number(bound),))
+            lines.append(f'{name}_bucket{labels} {n}')
+        lines.append(f'{name}_sum{_labels(label_names, values)} {_number(float(total))}')
+        lines.append(f'{name}_count{_labels(label_names, values)} {count}')
+    return lines
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+import numpy as np
+from scoring import score_queries, top_k
+
+# Neighbors kept per title; get_recommendations falls back to live scoring above this
+DEFAULT_NEIGHBORS = 50
+
+# Rows scored per block. Peak memory is roughly block_size * n_rows * 8 bytes for
+# the dense score buffer (512 rows over 65k titles is about 270 MB)
+DEFAULT_BLOCK_SIZE = 512
+
+NEIGHBOR_INDEX_FILE = 'neighbors_idx.npy'
+NEIGHBOR_SCORE_FILE = 'neighbors_scores.npy'
+NEIGHBOR_META_FILE = 'neighbors.json'
+
+def neighbor_block(matrix, start, stop, k):
+    """Top-k neighbors (excluding the row itself) for rows start:stop of matrix.
+
+    Returns int32 indices and float32 scores, both of shape (stop - start, k),
+    best first with ties broken by the lower row index.
+    """
+    if k <= 0:
+        # n - k would be out of bounds for argpartition, e.g. in a one-title catalog
+        return np.empty((stop - start, 0), dtype=np.int32), np.empty((stop - start, 0), dtype=np.float32)
+    scores = score_queries(matrix, matrix[start:stop])
+    rows = np.arange(stop - start)
+    scores[rows, start + rows] = -np.inf
+
+    # Partition from the top end rather than negating, which would allocate a
+    # second buffer the size of the scores
+    n = scores.shape[1]
+    part = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+
+    # Where more rows tie at the k-th score than were kept, redo that row with
+    # top_k so the lower row ids win, as in live scoring
+    threshold = part_scores.min(axis=1)
+    tied = (scores >= threshold[:, None]).sum(axis=1) > k
+    for row in np.flatnonzero(tied):
+        part[row] = top_k(scores[row], k)
+        part_scores[row] = scores[row, part[row]]
+
+    order = np.lexsort((part, -part_scores), axis=-1)
+    top = np.take_along_axis(part, order, axis=1)
+    top_scores = np.take_along_axis(part_scores, order, axis=1)
+    return top.astype(np.int32), top_scores.astype(np.float32)
+
+def build_neighbor_table(matrix, out_dir, k=DEFAULT_NEIGHBORS, block_size=DEFAULT_BLOCK_SIZE, model_version=None):
+    """Compute the top-k neighbor table of matrix in row blocks and write it to out_dir"""
+    os.makedirs(out_dir, exist_ok=True)
+    matrix = matrix.tocsr()
+    n_rows = matrix.shape[0]
+    k = min(k, n_rows - 1)
+
+    # Results go straight into on-disk arrays so only one block is ever in memory
+    index_table = np.lib.format.open_memmap(
+        os.path.join(out_dir, NEIGHBOR_INDEX_FILE), mode='w+', dtype=np.int32, shape=(n_rows, k)
+    )
+    score_table = np.lib.format.open_memmap(
+        os.path.join(out_dir, NEIGHBOR_SCORE_FILE), mode='w+', dtype=np.float32, shape=(n_rows, k)
+    )
+
+    start_time = time.perf_counter()
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        index_table[start:stop], score_table[start:stop] = neighbor_block(matrix, start, stop, k)
+        elapsed = time.perf_counter() - start_time
+        print(f"  {stop}/{n_rows} rows ({stop / elapsed:.0f} rows/s)", end='\r')
+    print()
+    index_table.flush()
+    score_table.flush()
+    del index_table, score_table
+
+    meta = {'k': k, 'n_rows': n_rows, 'model_version': model_version}
+    with open(os.path.join(out_dir, NEIGHBOR_META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def has_neighbor_table(path):
+    """Whether path contains a neighbor table"""
+    return os.path.exists(os.path.join(path, NEIGHBOR_META_FILE))
+
+def read_neighbor_table(path, mmap=True):
+    """Load a neighbor table; returns (indices, scores, meta)"""
+    with open(os.path.join(path, NEIGHBOR_META_FILE)) as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    indices = np.load(os.path.join(path, NEIGHBOR_INDEX_FILE), mmap_mode=mmap_mode)
+    scores = np.load(os.path.join(path, NEIGHBOR_SCORE_FILE), mmap_mode=mmap_mode)
+    return indices, scores, meta
+
+if __name__ == "__main__":
+    import argparse
+    from artifact import resolve_artifact_dir
+    from recommender import AnimeRecommender
+
+    parser = argparse.ArgumentParser(description="Build the top-k neighbor table for a model artifact")
+    parser.add_argument('--artifact', default='anime_recommender/model',
+                        help="Artifact built by artifact.py; the table is written next to it")
+    parser.add_argument('-k', type=int, default=DEFAULT_NEIGHBORS)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    out_dir = resolve_artifact_dir(args.artifact)
+    recommender = AnimeRecommender.from_artifact(out_dir)
+    print(f"Building top-{args.k} neighbor table in blocks of {args.block_size} rows...")
+    meta = build_neighbor_table(
+        recommender.tfidf_matrix, out_dir, args.k, args.block_size, recommender.model_version
+    )
+    print(f"Neighbor table written to '{out_dir}' ({meta['n_rows']} x {meta['k']})")
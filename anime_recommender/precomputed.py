@@ -0,0 +1,250 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+import pandas as pd
+from cache import DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL, ResultCache
+from neighbors import DEFAULT_BLOCK_SIZE, DEFAULT_NEIGHBORS, neighbor_block
+from results import RESULT_COLUMNS, Recommendations, ResultMetadata
+from title_index import TitleIndex
+
+# Bump this whenever the database layout changes so stale databases are rejected
+DATABASE_FORMAT_VERSION = 1
+
+DEFAULT_DATABASE_PATH = 'anime_recommender/recommendations.db'
+
+TITLE_COLUMNS = RESULT_COLUMNS + ['rating']
+
+SCHEMA = f"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE titles (id INTEGER PRIMARY KEY, {', '.join(f'{c} TEXT' for c in TITLE_COLUMNS)});
+CREATE TABLE neighbors (
+    id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    neighbor_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (id, rank)
+) WITHOUT ROWID;
+"""
+
+# One statement per lookup; sqlite3 keeps it compiled in each connection's statement cache
+NEIGHBORS_QUERY = f"""
+SELECT {', '.join(f't.{c}' for c in RESULT_COLUMNS)}, n.score
+FROM neighbors n JOIN titles t ON t.id = n.neighbor_id
+WHERE n.id = ? ORDER BY n.rank LIMIT ?
+"""
+
+def build_database(recommender, path=DEFAULT_DATABASE_PATH, k=DEFAULT_NEIGHBORS, block_size=DEFAULT_BLOCK_SIZE):
+    """Write every live title's top-k neighbors and metadata from a fitted AnimeRecommender to a SQLite file.
+
+    The database is built next to path and moved into place when complete,
+    so readers never see a partial file. Returns the stored settings.
+    """
+    matrix = recommender.tfidf_matrix.tocsr()
+    df = recommender.df
+    live = ~recommender._removed
+    if not live.all():
+        matrix = matrix[live]
+        df = df[live].reset_index(drop=True)
+    n_rows = matrix.shape[0]
+    k = min(k, n_rows - 1)
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    # WAL lets any number of readers share the file without blocking each other
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.executescript(SCHEMA)
+
+    titles = df.reindex(columns=TITLE_COLUMNS).astype(object)
+    titles = titles.where(titles.notna(), None)
+    with connection:
+        connection.executemany(
+            f"INSERT INTO titles VALUES (?, {', '.join('?' for _ in TITLE_COLUMNS)})",
+            ((i, *row) for i, row in enumerate(titles.itertuples(index=False, name=None))),
+        )
+
+    start_time = time.perf_counter()
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        indices, scores = neighbor_block(matrix, start, stop, k)
+        with connection:
+            connection.executemany(
+                "INSERT INTO neighbors VALUES (?, ?, ?, ?)",
+                (
+                    (start + offset, rank, neighbor, score)
+                    for offset, (row, row_scores) in enumerate(zip(indices.tolist(), scores.tolist()))
+                    for rank, (neighbor, score) in enumerate(zip(row, row_scores))
+                ),
+            )
+        elapsed = time.perf_counter() - start_time
+        print(f"  {stop}/{n_rows} rows ({stop / elapsed:.0f} rows/s)", end='\r')
+    print()
+
+    meta = {
+        'format_version': DATABASE_FORMAT_VERSION,
+        'model_version': recommender.model_version,
+        'k': k,
+        'n_rows': n_rows,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with connection:
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", ((key, str(value)) for key, value in meta.items()))
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    connection.close()
+    os.replace(tmp_path, path)
+    return meta
+
+class PrecomputedRecommender:
+    """Title recommendations served from a SQLite database of precomputed neighbor lists.
+
+    Implements get_recommendations like AnimeRecommender without loading the
+    TF-IDF matrix: each request is one indexed read of the title's neighbor
+    rows joined to their metadata. Every thread gets its own read-only
+    connection, reopened after a fork, and the database runs in WAL mode so
+    readers never block each other. Only titles are kept in memory (for
+    lookup and search). Results hold at most the k neighbors stored per title,
+    and their indices point into each result's own metadata.
+
+    Only unfiltered title requests can be answered from the stored lists, so
+    feature, profile and facet methods are absent and supports_filters is
+    False; app.py checks both and answers such requests with 501.
+    """
+
+    supports_filters = False
+
+    def __init__(self, path=DEFAULT_DATABASE_PATH, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No precomputed database at '{path}'; build one with precomputed.py")
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get('format_version') != str(DATABASE_FORMAT_VERSION):
+            raise ValueError(
+                f"Unsupported database format {meta.get('format_version')} "
+                f"(expected {DATABASE_FORMAT_VERSION}) in '{path}'"
+            )
+        self.model_version = meta['model_version']
+        self.k = int(meta['k'])
+
+        titles = [row[0] for row in connection.execute("SELECT title FROM titles ORDER BY id")]
+        self.df = pd.DataFrame({'title': titles})
+        self._ids = {}
+        for i, title in enumerate(titles):
+            self._ids.setdefault(title, i)
+        self._title_index = None
+        self.result_cache = ResultCache(cache_size, cache_ttl)
+        print(f"Loaded precomputed recommendations for {len(titles)} anime entries (top {self.k})")
+
+    def _connection(self):
+        """This thread's connection, opened on first use and again in a forked child"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(self.path, cached_statements=32)
+            local.connection.execute('PRAGMA query_only = ON')
+            local.pid = os.getpid()
+        return local.connection
+
+    @property
+    def title_index(self):
+        """Title search index, built on first use"""
+        if self._title_index is None:
+            self._title_index = TitleIndex(self.df['title'].fillna('').astype(str).to_numpy())
+        return self._title_index
+
+    def search_titles(self, query, limit=10):
+        """Find titles matching query by exact, prefix, substring or typo-tolerant match"""
+        return [str(t) for t in self.title_index.search(query, limit)]
+
+    def get_recommendations(self, title, num_recommendations=10, engine='sparse', n_probe=None, as_frame=False):
+        """Get anime recommendations based on title, from the precomputed neighbor lists.
+
+        Returns a Recommendations result, or a DataFrame with as_frame=True.
+        engine and n_probe are accepted for compatibility and ignored, since
+        the stored neighbors are exact.
+        """
+        idx = self._ids.get(title)
+        if idx is None:
+            similar_titles = self.search_titles(title, 5)
+            if similar_titles:
+                print(f"Exact title '{title}' not found. Did you mean one of these?")
+                for i, t in enumerate(similar_titles):
+                    print(f"{i+1}. {t}")
+            else:
+                print(f"Anime '{title}' not found in the dataset.")
+            resolved = Recommendations.none()
+        else:
+            resolved = self._lookup(idx, num_recommendations)
+        if as_frame:
+            return resolved.to_frame()
+        return resolved
+
+    def _lookup(self, idx, k):
+        """Top k stored neighbors of row idx with their metadata, through the result cache"""
+        if k <= 0:
+            # SQLite reads a negative LIMIT as no limit at all
+            return Recommendations.none()
+        cache_key = ('title', idx, k)
+        self.result_cache.ensure_version(self.model_version)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        rows = self._connection().execute(NEIGHBORS_QUERY, (idx, k)).fetchall()
+        resolved = Recommendations(
+            range(len(rows)), [row[-1] for row in rows], ResultMetadata.from_rows([row[:-1] for row in rows])
+        )
+        self.result_cache.put(cache_key, resolved)
+        return resolved
+
+    def recommend_batch(self, requests):
+        """Answer (kind, params) title requests one by one"""
+        results = []
+        for kind, params in requests:
+            try:
+                if kind != 'title':
+                    raise ValueError(f"The precomputed backend only answers title requests, not '{kind}'")
+                results.append(self.get_recommendations(**params))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def cache_stats(self):
+        """Hit, miss and eviction counters of the result cache"""
+        return self.result_cache.stats()
+
+    def memory_report(self):
+        """Approximate bytes held in memory per component; the database itself stays on disk"""
+        titles = self.df['title']
+        report = {
+            'titles': int(titles.memory_usage(index=False, deep=True)),
+            'title_lookup': sys.getsizeof(self._ids),
+        }
+        if self._title_index is not None:
+            index = self._title_index
+            report['title_index'] = (
+                index.titles.nbytes + index.sorted_rows.nbytes + index._gram_counts.nbytes
+                + sum(rows.nbytes for rows in index._postings.values())
+            )
+        report['total'] = sum(report.values())
+        report['mapped'] = 0
+        return report
+
+if __name__ == "__main__":
+    import argparse
+    from recommender import AnimeRecommender
+
+    parser = argparse.ArgumentParser(description="Build a SQLite database of precomputed recommendations")
+    parser.add_argument('--data', default='anime_recommender/processed_anime_data.csv')
+    parser.add_argument('--artifact', help="Load the fitted model from this artifact instead of fitting --data")
+    parser.add_argument('--out', default=DEFAULT_DATABASE_PATH)
+    parser.add_argument('-k', type=int, default=DEFAULT_NEIGHBORS)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    recommender = AnimeRecommender.from_artifact(args.artifact) if args.artifact else AnimeRecommender(args.data)
+    print(f"Writing top-{args.k} neighbors in blocks of {args.block_size} rows...")
+    meta = build_database(recommender, args.out, args.k, args.block_size)
+    print(f"Database written to '{args.out}' ({meta['n_rows']} titles x {meta['k']} neighbors)")
@@ -1,8 +1,12 @@
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+from neighbors import DEFAULT_BLOCK_SIZE, DEFAULT_NEIGHBORS, build_neighbor_table
+from columnar import SCHEMA_FILE, ColumnarWriter, is_columnar, read_columnar, read_schema
 
 def clean_text(text):
     """Clean text data by removing special characters and converting to lowercase"""
@@ -18,27 +22,49 @@ def clean_text(text):
     text = ' '.join(text.split())
     return text
 
-def preprocess_anime_data():
-    """Preprocess the anime data for recommendation system"""
-    # Load the full dataset
-    print("Loading dataset...")
-    df = pd.read_csv('65k_anime_data.csv', encoding='utf-8', encoding_errors='ignore')
-    print(f"Dataset loaded with {len(df)} rows")
-    
-    # Select relevant columns for recommendation system
-    relevant_columns = ['title', 'genres', 'themes', 'demographics', 'rating', 'synopsis']
-    df_processed = df[relevant_columns].copy()
-    
-    # Handle missing values
-    df_processed['genres'] = df_processed['genres'].fillna('')
-    df_processed['themes'] = df_processed['themes'].fillna('')
-    df_processed['demographics'] = df_processed['demographics'].fillna('')
-    df_processed['synopsis'] = df_processed['synopsis'].fillna('')
+# Raw columns the pipeline needs; everything else in the CSV is never parsed
+RELEVANT_COLUMNS = ['title', 'genres', 'themes', 'demographics', 'rating', 'synopsis']
+TEXT_COLUMNS = ['genres', 'themes', 'demographics', 'synopsis']
+
+RAW_DATA_PATH = '65k_anime_data.csv'
+PROCESSED_DATA_PATH = 'anime_recommender/processed_anime_data.csv'
+DEFAULT_CHUNKSIZE = 10000
+
+# Columns of the processed dataset, in file order
+PROCESSED_COLUMNS = RELEVANT_COLUMNS + ['combined_features']
+
+# Output formats of the pipeline; columnar datasets are directories named
+# like the CSV without its extension
+OUTPUT_FORMATS = ['columnar', 'csv']
+
+# Batch versions of the clean_text steps. Cells of a column are joined with NUL
+# (which clean_text would strip anyway) so each step is one regex pass per chunk
+_CELL_SEPARATOR = '\0'
+_SPECIAL_CHARS = re.compile(r'[^a-zA-Z0-9\s,\0]')
+_WHITESPACE = re.compile(r'\s+')
+_CELL_EDGES = re.compile(r' ?\0 ?')
+
+def clean_text_column(values):
+    """Apply clean_text to a whole column at once; output matches clean_text exactly"""
+    cells = values.fillna('').astype(str).tolist()
+    if not cells:
+        return values.astype(object)
+    blob = _CELL_SEPARATOR.join(cells)
+    if blob.count(_CELL_SEPARATOR) != len(cells) - 1:
+        # A cell contains the separator itself; fall back to the per-cell path
+        return values.apply(clean_text)
+    blob = _SPECIAL_CHARS.sub('', blob).lower()
+    blob = _WHITESPACE.sub(' ', blob)
+    blob = _CELL_EDGES.sub(_CELL_SEPARATOR, blob).strip(' ')
+    return pd.Series(blob.split(_CELL_SEPARATOR), index=values.index, dtype=object)
+
+def process_chunk(chunk):
+    """Clean one chunk of raw rows and build its combined features"""
+    df_processed = chunk[RELEVANT_COLUMNS].copy()
     
-    # Clean text data
-    text_columns = ['genres', 'themes', 'demographics', 'synopsis']
-    for col in text_columns:
-        df_processed[col] = df_processed[col].apply(clean_text)
+    # Clean text data (missing values become empty strings)
+    for col in TEXT_COLUMNS:
+        df_processed[col] = clean_text_column(df_processed[col])
     
     # Create a combined feature for content-based filtering
     df_processed['combined_features'] = (
@@ -49,27 +75,144 @@ def preprocess_anime_data():
     )
     
     # Remove rows with empty combined features
-    df_processed = df_processed[df_processed['combined_features'].str.strip() != '']
+    return df_processed[df_processed['combined_features'].str.strip() != '']
+
+def read_raw_chunks(path=RAW_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream the raw dataset in chunks, parsing only the relevant columns as strings"""
+    return pd.read_csv(
+        path, usecols=RELEVANT_COLUMNS, dtype={col: str for col in RELEVANT_COLUMNS},
+        chunksize=chunksize, encoding='utf-8', encoding_errors='ignore',
+    )
+
+def iter_processed_chunks(path=RAW_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Yield processed chunks in input order, optionally cleaning them on a process pool"""
+    chunks = read_raw_chunks(path, chunksize)
+    if workers <= 1:
+        for chunk in chunks:
+            yield process_chunk(chunk)
+        return
     
+    # Keep a bounded number of chunks in flight so memory stays flat
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(process_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def preprocess_anime_data(path=RAW_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Preprocess the anime data for recommendation system"""
+    print("Loading and cleaning dataset...")
+    df_processed = pd.concat(list(iter_processed_chunks(path, chunksize, workers)))
     print(f"Dataset processed with {len(df_processed)} rows after cleaning")
     return df_processed
 
-def create_similarity_matrix(df):
-    """Create a cosine similarity matrix based on combined features"""
+def columnar_path(csv_path):
+    """Directory holding the columnar copy of a processed CSV"""
+    return os.path.splitext(csv_path)[0]
+
+def write_processed_data(output_path=PROCESSED_DATA_PATH, path=RAW_DATA_PATH,
+                         chunksize=DEFAULT_CHUNKSIZE, workers=1, output_format='csv'):
+    """Stream the raw dataset through the pipeline into output_path; returns the rows written"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}' (expected {' or '.join(OUTPUT_FORMATS)})")
+    writer = ColumnarWriter(output_path, PROCESSED_COLUMNS) if output_format == 'columnar' else None
+    rows_out = 0
+    header = True
+    start = time.perf_counter()
+    for df_processed in iter_processed_chunks(path, chunksize, workers):
+        if writer is not None:
+            writer.append(df_processed)
+        else:
+            df_processed.to_csv(output_path, index=False, encoding='utf-8', header=header, mode='w' if header else 'a')
+        header = False
+        rows_out += len(df_processed)
+        elapsed = time.perf_counter() - start
+        print(f"  {rows_out} rows written ({rows_out / elapsed:.0f} rows/s)", end='\r')
+    if writer is not None:
+        writer.close()
+    print()
+    return rows_out
+
+def resolve_processed_path(path=PROCESSED_DATA_PATH):
+    """Path to load processed data from: a columnar dataset, or the CSV itself.
+
+    A CSV path resolves to its columnar copy when one exists and is at least
+    as new as the CSV (or the CSV is gone).
+    """
+    if is_columnar(path) or not path.endswith('.csv'):
+        return path
+    columnar = columnar_path(path)
+    if is_columnar(columnar) and (
+        not os.path.exists(path) or os.path.getmtime(os.path.join(columnar, SCHEMA_FILE)) >= os.path.getmtime(path)
+    ):
+        return columnar
+    return path
+
+def load_processed_data(path=PROCESSED_DATA_PATH, columns=None):
+    """Load processed data from either format, parsing only the given columns (all if None)"""
+    path = resolve_processed_path(path)
+    if is_columnar(path):
+        if columns is not None:
+            stored = {column['name'] for column in read_schema(path)['columns']}
+            columns = [c for c in columns if c in stored]
+        return read_columnar(path, columns)
+    return pd.read_csv(path, usecols=(lambda c: c in columns) if columns is not None else None)
+
+def peak_memory_mb():
+    """Peak resident memory of this process and its finished children in MB, or None where unavailable"""
+    try:
+        # Unix only; the pipeline itself runs anywhere
+        import resource
+    except ImportError:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+def format_mb(value):
+    """A memory figure for display, 'n/a' when it could not be measured"""
+    return 'n/a' if value is None else f"{value:.1f} MB"
+
+def create_neighbor_table(df, out_dir, k=DEFAULT_NEIGHBORS, block_size=DEFAULT_BLOCK_SIZE):
+    """Create the top-k neighbor table based on combined features.
+
+    Similarities are computed block by block and only the best k neighbors of
+    each title are kept, so the dense N x N matrix is never materialized.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    
     print("Creating TF-IDF matrix...")
     tfidf = TfidfVectorizer(stop_words='english', max_features=10000)
     tfidf_matrix = tfidf.fit_transform(df['combined_features'])
     
-    print("Calculating cosine similarity matrix...")
-    cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
+    print(f"Calculating top-{k} neighbors in blocks of {block_size} rows...")
+    meta = build_neighbor_table(tfidf_matrix, out_dir, k, block_size)
     
-    print("Similarity matrix created")
-    return cosine_sim
+    print("Neighbor table created")
+    return meta
 
 if __name__ == "__main__":
-    # Preprocess the data
-    df_processed = preprocess_anime_data()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Preprocess the raw anime dataset")
+    parser.add_argument('--input', default=RAW_DATA_PATH)
+    parser.add_argument('--output', help="Output path (default: the processed data path for --format)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='columnar',
+                        help="columnar writes a directory of column files that loads without CSV parsing")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--workers', type=int, default=1, help="Processes used to clean chunks")
+    args = parser.parse_args()
     
-    # Save processed data
-    df_processed.to_csv('anime_recommender/processed_anime_data.csv', index=False, encoding='utf-8')
-    print("Processed data saved to 'anime_recommender/processed_anime_data.csv'")
\ No newline at end of file
+    # Preprocess the data, streaming each chunk to the output as it is ready
+    output = args.output or (columnar_path(PROCESSED_DATA_PATH) if args.format == 'columnar' else PROCESSED_DATA_PATH)
+    print(f"Processing '{args.input}' in chunks of {args.chunksize} rows...")
+    start = time.perf_counter()
+    rows_out = write_processed_data(output, args.input, args.chunksize, args.workers, args.format)
+    elapsed = time.perf_counter() - start
+    own_mb, children_mb = peak_memory_mb() or (None, None)
+    print(f"Processed data saved to '{output}'")
+    print(f"{rows_out} rows kept in {elapsed:.2f}s ({rows_out / elapsed:.0f} rows/s)")
+    print(f"Peak memory: {format_mb(own_mb)} (largest worker: {format_mb(children_mb)})")
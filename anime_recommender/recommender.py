@@ -1,99 +1,1007 @@
+import copy
+import hashlib
+import mmap
+import sys
+import threading
+# pandas, SciPy and the helper modules are used by every method and take about 0.3 s
+# together, so only scikit-learn (about a second) is imported lazily, in
+# make_vectorizer; app.py defers importing this module until the model loads
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import scipy.sparse as sp
+from preprocessing import RELEVANT_COLUMNS, load_processed_data, process_chunk
+from neighbors import DEFAULT_BLOCK_SIZE, has_neighbor_table, neighbor_block, read_neighbor_table
+from shards import ShardedMatrix, has_shard_plan, read_shard_plan
+from title_index import TitleIndex
+from cache import DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL, ResultCache
+from facets import FACET_COLUMNS, INDEXED_COLUMNS, FacetIndex, filter_value
+from tag_vectors import TagVectorTable
+from results import Recommendations, ResultMetadata
+from embedding import DEFAULT_COMPONENTS, DEFAULT_PROBES, EmbeddingIndex
+from metrics import stage_metrics
+from scoring import QUERY_BLOCK_SIZE, score_query, score_queries, top_k
 import warnings
 warnings.filterwarnings('ignore')
 
+# Candidate sets smaller than this share of the catalog are scored on their own
+# rows; larger ones are cheaper to score with the full product and then subset
+CANDIDATE_SLICE_FRACTION = 0.25
+
+# Share of unknown words in text added since the last fit that triggers a background refit
+DEFAULT_DRIFT_THRESHOLD = 0.1
+
+# Width of the hashed feature space used by the vocabulary-free vectorizer
+HASHING_FEATURES = 2 ** 18
+
+# Lean mode drops the text only needed for fitting and stores repeated tag
+# strings once per distinct value
+LEAN_DROPPED_COLUMNS = ['synopsis', 'combined_features']
+LEAN_CATEGORICAL_COLUMNS = ['genres', 'themes', 'demographics', 'rating']
+
+# Processed columns read at startup; the synopsis only reaches the model
+# through combined_features, so it is never loaded
+LOAD_COLUMNS = ['title', 'genres', 'themes', 'demographics', 'rating', 'combined_features']
+
+def make_vectorizer(kind='tfidf'):
+    """Unfitted text vectorizer: TF-IDF over a fixed vocabulary, or a vocabulary-free hashing pipeline"""
+    # scikit-learn takes about a second to import and is only needed to fit or
+    # transform, so it is imported here rather than with the module
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+    from sklearn.pipeline import make_pipeline
+
+    if kind == 'hashing':
+        return make_pipeline(
+            HashingVectorizer(stop_words='english', n_features=HASHING_FEATURES, alternate_sign=False, norm=None),
+            TfidfTransformer(),
+        )
+    if kind != 'tfidf':
+        raise ValueError(f"Unknown vectorizer '{kind}' (expected 'tfidf' or 'hashing')")
+    return TfidfVectorizer(stop_words='english', max_features=10000)
+
+def _lean_frame(df):
+    """Catalog frame without the fitting text, with tag columns as NaN-free categoricals"""
+    df = df.drop(columns=[c for c in LEAN_DROPPED_COLUMNS if c in df.columns])
+    for column in LEAN_CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].fillna('').astype('category')
+    return df
+
+def _is_mapped(array):
+    """Whether a numpy array's memory comes from a memory-mapped file"""
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return isinstance(array, mmap.mmap)
+
+def _array_bytes(*arrays):
+    """(resident, mapped) bytes of numpy arrays; mapped pages live in the shared page cache"""
+    resident = mapped = 0
+    for array in arrays:
+        if array is None:
+            continue
+        if _is_mapped(array):
+            mapped += array.nbytes
+        else:
+            resident += array.nbytes
+    return resident, mapped
+
+def _strings_bytes(strings):
+    """Approximate bytes of a collection of Python strings, including the container's pointers"""
+    return sys.getsizeof(strings) + sum(sys.getsizeof(s) for s in strings)
+
+def _canonical_tags(tags):
+    """Lowercased, de-duplicated and sorted tags, or None if there are none"""
+    if not tags:
+        return None
+    tags = sorted({str(tag).strip().lower() for tag in tags} - {''})
+    return tags or None
+
+def _canonical_filters(spec):
+    """Filter spec (column -> values) with canonical, de-duplicated, sorted values and empty entries dropped"""
+    canonical = {}
+    for column, values in (spec or {}).items():
+        if isinstance(values, str):
+            values = [values]
+        values = sorted({filter_value(column, value) for value in values or ()} - {''})
+        if values:
+            canonical[column] = values
+    return canonical
+
+def _filters_key(spec):
+    """Hashable cache-key form of a canonical filter spec"""
+    return tuple(sorted((column, tuple(values)) for column, values in spec.items()))
+
 class AnimeRecommender:
-    def __init__(self, data_path='anime_recommender/processed_anime_data.csv'):
-        """Initialize the recommender system with processed data"""
+    def __init__(self, data_path='anime_recommender/processed_anime_data.csv',
+                 cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL,
+                 vectorizer='tfidf', drift_threshold=DEFAULT_DRIFT_THRESHOLD, lean=False):
+        """Initialize the recommender system with processed data.
+
+        data_path is a processed CSV or columnar dataset (see preprocessing.py);
+        a CSV's columnar copy is used when it is up to date. The synopsis is
+        never loaded. lean=True keeps a float32 matrix and drops the combined
+        text after fitting (so the model cannot refit), storing tag columns as
+        categoricals; see memory_report().
+        """
         print("Loading processed data...")
-        self.df = pd.read_csv(data_path)
+        with stage_metrics.time('load_read'):
+            self.df = load_processed_data(data_path, LOAD_COLUMNS)
         print(f"Loaded {len(self.df)} anime entries")
         
-        # Create indices for fast lookup
-        self.indices = pd.Series(self.df.index, index=self.df['title']).drop_duplicates()
-        
         # Initialize TF-IDF vectorizer
         print("Initializing TF-IDF vectorizer...")
-        self.tfidf = TfidfVectorizer(stop_words='english', max_features=10000)
-        self.tfidf_matrix = self.tfidf.fit_transform(self.df['combined_features'])
+        self.vectorizer_kind = vectorizer
+        self.tfidf = make_vectorizer(vectorizer)
+        with stage_metrics.time('load_fit'):
+            self.tfidf_matrix = self.tfidf.fit_transform(self.df['combined_features'])
+        self.lean = lean
+        if lean:
+            with stage_metrics.time('load_lean'):
+                self._make_lean()
+        with stage_metrics.time('load_fingerprint'):
+            self.model_version = self._fingerprint()
+        self._finish_loading(cache_size, cache_ttl, drift_threshold)
         print("Recommender system initialized!")
     
-    def get_recommendations(self, title, num_recommendations=10):
-        """Get anime recommendations based on title"""
+    @classmethod
+    def from_artifact(cls, path, mmap=True, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL,
+                      drift_threshold=DEFAULT_DRIFT_THRESHOLD, lean=False):
+        """Load a recommender from a prebuilt artifact (see artifact.py) without refitting.
+
+        With lean=True a float64 artifact matrix is converted to a private
+        float32 copy; build the artifact from a lean model to map float32 directly.
+        """
+        from artifact import load_artifact, resolve_artifact_dir
+        
+        recommender = cls.__new__(cls)
+        with stage_metrics.time('load_artifact'):
+            recommender.df, recommender.tfidf, recommender.tfidf_matrix, manifest = load_artifact(path, mmap=mmap)
+        recommender.vectorizer_kind = manifest['vectorizer'].get('kind', 'tfidf')
+        recommender.model_version = manifest['model_version']
+        recommender.lean = lean
+        if lean:
+            with stage_metrics.time('load_lean'):
+                recommender._make_lean()
+        recommender._finish_loading(cache_size, cache_ttl, drift_threshold)
+        print(f"Loaded model {recommender.model_version} with {len(recommender.df)} anime entries")
+        
+        # Pick up a precomputed neighbor table stored alongside the artifact
+        artifact_dir = resolve_artifact_dir(path)
+        if has_neighbor_table(artifact_dir):
+            recommender.load_neighbor_table(artifact_dir, mmap=mmap)
+        if has_shard_plan(artifact_dir):
+            recommender.load_shards(artifact_dir, mmap=mmap)
+        return recommender
+    
+    def _make_lean(self):
+        """Shrink the catalog for serving: float32 matrix, no fitting text, categorical tags"""
+        if self.tfidf_matrix.dtype != np.float32:
+            self.tfidf_matrix = self.tfidf_matrix.astype(np.float32)
+        self.df = _lean_frame(self.df)
+        # Terms cut by max_features are kept by scikit-learn for inspection only
+        if hasattr(self.tfidf, 'stop_words_'):
+            del self.tfidf.stop_words_
+    
+    def _finish_loading(self, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL,
+                        drift_threshold=DEFAULT_DRIFT_THRESHOLD):
+        """Set up serving state shared by every way of loading a model"""
+        self.result_cache = ResultCache(cache_size, cache_ttl)
+        self.drift_threshold = drift_threshold
+        self._update_lock = threading.RLock()
+        self._refit_thread = None
+        self.sharded = None
+        # Settings of the neighbor table and embedding index in use, so a refit can rebuild them
+        self._neighbor_k = None
+        self._embedding_params = None
+        with stage_metrics.time('load_indices'):
+            self._reset_catalog_state()
+    
+    def _reset_catalog_state(self):
+        """Create indices for fast lookup and clear everything derived from the previous catalog"""
+        indices = pd.Series(self.df.index, index=self.df['title'])
+        # A title maps to one row, its first occurrence
+        self.indices = indices[~indices.index.duplicated()]
+        self.neighbor_table = None
+        self.embedding_index = None
+        self._reshard()
+        self._title_index = None
+        self._facet_index = None
+        self._tag_vectors = None
+        self._result_metadata = None
+        
+        # Tombstones for removed rows; they stay in the matrix until the next refit
+        self._removed = np.zeros(len(self.df), dtype=bool)
+        self._removed_rows = np.empty(0, dtype=np.intp)
+        
+        # Words seen in text added since the last fit, and how many the model did not know
+        self._added_tokens = 0
+        self._unknown_tokens = 0
+        self._seen_columns = None
+        if self.vectorizer_kind == 'hashing':
+            self._seen_columns = np.bincount(self.tfidf_matrix.indices, minlength=self.tfidf_matrix.shape[1]) > 0
+    
+    def load_neighbor_table(self, path, mmap=True):
+        """Serve get_recommendations from a precomputed top-k table (see neighbors.py)"""
+        indices, scores, meta = read_neighbor_table(path, mmap=mmap)
+        if meta['n_rows'] != self.tfidf_matrix.shape[0] or meta['model_version'] not in (None, self.model_version):
+            raise ValueError(f"Neighbor table in '{path}' was built for a different model")
+        self.neighbor_table = (indices, scores)
+        self._neighbor_k = indices.shape[1]
+        print(f"Loaded top-{meta['k']} neighbor table")
+    
+    def shard(self, n_shards, workers=None):
+        """Split the matrix rows into n_shards scored concurrently by workers threads (1 turns sharding off)"""
+        self.sharded = ShardedMatrix.from_matrix(self.tfidf_matrix, n_shards, workers) if n_shards > 1 else None
+        return self.sharded
+    
+    def load_shards(self, path, mmap=True, workers=None):
+        """Score from the shards of an artifact's shard plan, each loaded on its own (see shards.py)"""
+        plan = read_shard_plan(path)
+        if plan['n_rows'] != self.tfidf_matrix.shape[0] or plan['model_version'] not in (None, self.model_version):
+            raise ValueError(f"Shard plan in '{path}' was built for a different model")
+        if plan['n_shards'] <= 1:
+            return None
+        sharded = ShardedMatrix.load(path, mmap=mmap, workers=workers)
+        if sharded.shards[0].dtype != self.tfidf_matrix.dtype:
+            # A lean model converted the matrix, so shard the converted copy at the same boundaries
+            sharded = ShardedMatrix.from_matrix(self.tfidf_matrix, plan['n_shards'], workers, plan['offsets'])
+        self.sharded = sharded
+        print(f"Loaded {sharded.n_shards} matrix shards")
+        return sharded
+    
+    def _reshard(self):
+        """Re-split a changed matrix into as many shards as before"""
+        if self.sharded is not None:
+            self.shard(self.sharded.n_shards, self.sharded.workers)
+    
+    def _score_all(self, query_vector):
+        """Scores of one query against every row, over the shards when the matrix is sharded"""
+        if self.sharded is not None:
+            return self.sharded.score(query_vector)
+        return score_query(self.tfidf_matrix, query_vector)
+    
+    def build_embedding_index(self, n_components=DEFAULT_COMPONENTS, method='svd', n_lists=None):
+        """Build the dense low-rank embedding and ANN index used by engine='ann'"""
+        print(f"Building {n_components}-dimensional {method} embedding index...")
+        self.embedding_index = EmbeddingIndex(self.tfidf_matrix, n_components, method, n_lists)
+        self._embedding_params = (n_components, method, n_lists)
+        self.result_cache.clear()
+        print(f"Embedding index ready ({self.embedding_index.n_lists} lists)")
+        return self.embedding_index
+    
+    def memory_report(self):
+        """Approximate bytes held by each component of the loaded model.
+
+        Memory-mapped arrays (a model loaded from an artifact with mmap=True)
+        are shared through the page cache, so they are reported under 'mapped'
+        and left out of 'total'.
+        """
+        mapped = 0
+        report = {}
+        
+        def add(component, resident_and_mapped):
+            nonlocal mapped
+            report[component] = resident_and_mapped[0]
+            mapped += resident_and_mapped[1]
+        
+        matrix = self.tfidf_matrix
+        add('tfidf_matrix', _array_bytes(matrix.data, matrix.indices, matrix.indptr))
+        
+        if self.vectorizer_kind == 'hashing':
+            add('vectorizer', _array_bytes(self.tfidf[-1].idf_))
+        else:
+            vocabulary = self.tfidf.vocabulary_
+            stop_words = getattr(self.tfidf, 'stop_words_', set())
+            report['vectorizer'] = (
+                sys.getsizeof(vocabulary) + _strings_bytes(vocabulary) + _strings_bytes(stop_words)
+                + self.tfidf.idf_.nbytes
+            )
+        
+        for column in self.df.columns:
+            report[f'catalog.{column}'] = int(self.df[column].memory_usage(index=False, deep=True))
+        # The index shares its title strings with catalog.title, so only its pointers count
+        report['indices'] = int(self.indices.memory_usage(deep=False))
+        report['tombstones'] = self._removed.nbytes + self._removed_rows.nbytes
+        
+        if self._result_metadata is not None:
+            # The cleaned frame and the per-column arrays point at the catalog's strings
+            metadata = self._result_metadata
+            report['result_metadata'] = (
+                int(metadata.frame.memory_usage(index=False).sum())
+                + sum(values.nbytes for values in metadata.columns.values())
+                + sum(_strings_bytes(encoded) for _, encoded in metadata._encoded or ())
+            )
+        if self._title_index is not None:
+            index = self._title_index
+            report['title_index'] = (
+                index.titles.nbytes + _strings_bytes(index.keys) + sys.getsizeof(index._sorted_keys)
+                + index.sorted_rows.nbytes + index._gram_counts.nbytes
+                + sum(rows.nbytes + sys.getsizeof(gram) for gram, rows in index._postings.items())
+            )
+        if self._facet_index is not None:
+            index = self._facet_index
+            report['facet_index'] = sum(
+                m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+                for facet in INDEXED_COLUMNS for m in (index.incidence[facet], index._postings[facet])
+            ) + sum(_strings_bytes(index.tags[facet]) for facet in INDEXED_COLUMNS)
+        if self._tag_vectors is not None:
+            report['tag_vectors'] = self._tag_vectors.nbytes() + _strings_bytes(self._tag_vectors.terms)
+        if self.neighbor_table is not None:
+            add('neighbor_table', _array_bytes(*self.neighbor_table))
+        if self.sharded is not None:
+            report['shards'] = self.sharded.nbytes()
+        if self.embedding_index is not None:
+            index = self.embedding_index
+            components = index.projection.components_
+            if sp.issparse(components):
+                components = components.tocsr()
+                components = (components.data, components.indices, components.indptr)
+            else:
+                components = (components,)
+            add('embedding_index', _array_bytes(
+                index.vectors, index.centroids, index.list_rows, index.list_offsets, index.labels, *components
+            ))
+        
+        report['total'] = sum(report.values())
+        report['mapped'] = mapped
+        return report
+    
+    def _fingerprint(self):
+        """Short content hash identifying the fitted model"""
+        digest = hashlib.sha1()
+        matrix = self.tfidf_matrix
+        digest.update(np.asarray(matrix.shape, dtype=np.int64).tobytes())
+        for arr in (matrix.indptr, matrix.indices, matrix.data):
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        digest.update('\0'.join(self.df['title'].astype(str)).encode('utf-8'))
+        return digest.hexdigest()[:12]
+    
+    def cache_stats(self):
+        """Hit, miss and eviction counters of the result cache"""
+        return self.result_cache.stats()
+    
+    def _cache_get(self, key):
+        """Cached recommendations for key under the current model version, or None"""
+        self.result_cache.ensure_version(self.model_version)
+        return self.result_cache.get(key)
+    
+    def _cache_put(self, key, recommendations):
+        """Cache recommendations under key and return them (results are read-only, so nothing is copied)"""
+        self.result_cache.put(key, recommendations)
+        return recommendations
+    
+    @property
+    def title_index(self):
+        """Title search index over the live catalog, built on first use"""
+        if self._title_index is None:
+            titles = self.df['title'][~self._removed]
+            self._title_index = TitleIndex(titles.fillna('').astype(str).to_numpy())
+        return self._title_index
+    
+    @property
+    def result_metadata(self):
+        """NaN-free metadata arrays that results point into, built on first use"""
+        if self._result_metadata is None:
+            self._result_metadata = ResultMetadata(self.df)
+        return self._result_metadata
+    
+    @property
+    def facet_index(self):
+        """Genre/theme/demographic facet index, built on first use"""
+        if self._facet_index is None:
+            self._facet_index = FacetIndex(self.df)
+        return self._facet_index
+    
+    @property
+    def tag_vectors(self):
+        """Per-tag term columns and counts for the catalog's known tags, built on first use"""
+        if self._tag_vectors is None:
+            tags = [tag for facet in FACET_COLUMNS for tag in self.facet_index.tags[facet]]
+            self._tag_vectors = TagVectorTable(self.tfidf, tags)
+        return self._tag_vectors
+    
+    def facet_counts(self, genres=None, themes=None, demographics=None, match='any', exclude=None, filters=None):
+        """Per-facet tag counts over the live titles matching a feature query (all titles if no tags)"""
+        candidates = self._facet_candidates(
+            _canonical_tags(genres), _canonical_tags(themes), _canonical_tags(demographics), match, exclude, filters
+        )
+        mask = ~self._removed
+        if candidates is not None:
+            mask = np.zeros(len(self.df), dtype=bool)
+            mask[candidates] = True
+        return {'total': int(mask.sum()), 'facets': self.facet_index.counts(mask)}
+    
+    def search_titles(self, query, limit=10):
+        """Find titles matching query by exact, prefix, substring or typo-tolerant match"""
+        return [str(t) for t in self.title_index.search(query, limit)]
+    
+    def get_recommendations(self, title, num_recommendations=10, engine='sparse', n_probe=DEFAULT_PROBES,
+                            filters=None, exclude=None, as_frame=False):
+        """Get anime recommendations based on title.
+
+        Returns a Recommendations result, or a DataFrame with as_frame=True.
+        engine='ann' scores approximately against the embedding index (see
+        build_embedding_index); n_probe trades its recall against latency.
+        filters maps a column ('rating', 'genres', 'themes' or 'demographics')
+        to values a title must carry at least one of; exclude maps a column to
+        values it must not carry. Only eligible titles are scored, so a
+        filtered request still returns num_recommendations titles when that
+        many pass.
+        """
+        resolved, query = self._prepare_title(title, num_recommendations, engine, n_probe, filters, exclude)
+        if query is not None:
+            resolved = self._answer(query, self._rank_prepared(query))
+        if as_frame:
+            with stage_metrics.time('frame_assembly'):
+                return resolved.to_frame()
+        return resolved
+    
+    def _prepare_title(self, title, num_recommendations=10, engine='sparse', n_probe=DEFAULT_PROBES, filters=None,
+                       exclude=None):
+        """Resolve a title request up to scoring.
+
+        Returns (recommendations, None) when no scoring is needed (unknown
+        title, cache or neighbor-table hit), otherwise (None, query) with the
+        query vector and ranking arguments for _rank_prepared.
+        """
         # Check if the anime exists in our dataset
-        if title not in self.indices:
+        with stage_metrics.time('title_lookup'):
+            found = title in self.indices
+            if found:
+                # Get the index of the anime that matches the title
+                idx = self.indices[title]
+        if not found:
             # Try to find similar titles
-            similar_titles = [t for t in self.indices.index if title.lower() in t.lower()]
+            with stage_metrics.time('title_suggest'):
+                similar_titles = self.search_titles(title, 5)
             if similar_titles:
                 print(f"Exact title '{title}' not found. Did you mean one of these?")
-                for i, t in enumerate(similar_titles[:5]):
+                for i, t in enumerate(similar_titles):
                     print(f"{i+1}. {t}")
-                return pd.DataFrame()
+                return Recommendations.none(), None
             else:
                 print(f"Anime '{title}' not found in the dataset.")
-                return pd.DataFrame()
+                return Recommendations.none(), None
         
-        # Get the index of the anime that matches the title
-        idx = self.indices[title]
+        filters, exclude = _canonical_filters(filters), _canonical_filters(exclude)
+        cache_key = ('title', title, num_recommendations, engine, n_probe, _filters_key(filters), _filters_key(exclude))
+        with stage_metrics.time('cache_lookup'):
+            cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached, None
         
-        # Get the pairwise similarity scores of all anime with that anime
-        sim_scores = cosine_similarity(self.tfidf_matrix[idx], self.tfidf_matrix).flatten()
+        # Narrow to the live titles passing the filters before any scoring
+        allowed = candidates = None
+        if filters or exclude:
+            with stage_metrics.time('attribute_filter'):
+                allowed = self.facet_index.filter_mask(filters, exclude)
+                if self._removed_rows.size:
+                    allowed = allowed & ~self._removed
+                candidates = np.flatnonzero(allowed)
         
-        # Sort the anime based on the similarity scores
-        sim_scores_indices = sim_scores.argsort()[::-1]
+        # Answer from the precomputed neighbor table when it holds enough eligible entries
+        if self.neighbor_table is not None and engine == 'sparse':
+            with stage_metrics.time('neighbor_table'):
+                table_hit = self._table_lookup(idx, num_recommendations, allowed)
+            if table_hit is not None:
+                return self._cache_put(cache_key, self._to_result(*table_hit)), None
         
-        # Get the scores of the most similar anime (excluding the anime itself)
-        sim_scores_indices = sim_scores_indices[1:num_recommendations+1]
-        sim_scores = sim_scores[sim_scores_indices]
+        # Score every eligible anime against it and keep the top matches (excluding the anime itself)
+        return None, {
+            'cache_key': cache_key, 'vector': self.tfidf_matrix[idx], 'k': num_recommendations,
+            'exclude': [idx], 'engine': engine, 'n_probe': n_probe, 'candidates': candidates,
+        }
+    
+    def get_recommendations_for_profile(self, titles, weights=None, num_recommendations=10, engine='sparse',
+                                        n_probe=DEFAULT_PROBES, filters=None, exclude=None, as_frame=False):
+        """Get recommendations for a watch history of several titles in one scoring pass.
+
+        The seed rows are combined into one weighted, L2-normalized profile
+        vector (weights default to 1 per title; a repeated title adds up its
+        weights) and scored like a single title. Seed titles are never
+        recommended, and titles not in the dataset are skipped. filters and
+        exclude work as in get_recommendations.
+        """
+        resolved, query = self._prepare_profile(titles, weights, num_recommendations, engine, n_probe, filters,
+                                                exclude)
+        if query is not None:
+            resolved = self._answer(query, self._rank_prepared(query))
+        if as_frame:
+            with stage_metrics.time('frame_assembly'):
+                return resolved.to_frame()
+        return resolved
+    
+    def _prepare_profile(self, titles, weights=None, num_recommendations=10, engine='sparse', n_probe=DEFAULT_PROBES,
+                         filters=None, exclude=None):
+        """Resolve a profile request up to scoring; returns (recommendations, None) or (None, query)"""
+        titles = list(titles)
+        weights = [1.0] * len(titles) if weights is None else [float(w) for w in weights]
+        if len(weights) != len(titles):
+            raise ValueError(f"Got {len(weights)} weights for {len(titles)} titles")
         
-        # Get the anime indices
-        anime_indices = sim_scores_indices
+        # Sum the weights of each title, then find all seed rows in one lookup
+        with stage_metrics.time('title_lookup'):
+            summed = {}
+            for title, weight in zip(titles, weights):
+                summed[title] = summed.get(title, 0.0) + weight
+            rows = self._title_rows(list(summed))
+        missing = int((rows < 0).sum())
+        if missing:
+            print(f"{missing} profile title(s) not found in the dataset.")
+        found = rows >= 0
+        seeds = {title: weight for (title, weight), kept in zip(summed.items(), found) if kept}
+        rows = rows[found]
+        # A zero-weight seed adds nothing to the profile but is still never recommended
+        weights = np.fromiter(seeds.values(), dtype=self.tfidf_matrix.dtype, count=len(seeds))
+        weighted = weights != 0
+        if not weighted.any():
+            return Recommendations.none(), None
         
-        # Return the top most similar anime
-        recommendations = self.df[['title', 'genres', 'themes', 'demographics']].iloc[anime_indices].copy()
-        recommendations['similarity_score'] = sim_scores
+        filters, exclude = _canonical_filters(filters), _canonical_filters(exclude)
+        cache_key = ('profile', tuple(sorted(seeds.items())), num_recommendations, engine, n_probe,
+                     _filters_key(filters), _filters_key(exclude))
+        with stage_metrics.time('cache_lookup'):
+            cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached, None
         
-        # Replace any NaN values with empty strings
-        recommendations = recommendations.fillna('')
+        candidates = None
+        if filters or exclude:
+            with stage_metrics.time('attribute_filter'):
+                allowed = self.facet_index.filter_mask(filters, exclude)
+                if self._removed_rows.size:
+                    allowed = allowed & ~self._removed
+                candidates = np.flatnonzero(allowed)
         
-        return recommendations.reset_index(drop=True)
+        # One sparse product sums the weighted seed rows into the profile vector
+        with stage_metrics.time('profile_vector'):
+            weight_row = sp.csr_matrix(weights[weighted])
+            profile = weight_row @ self.tfidf_matrix[rows[weighted]]
+            norm = np.sqrt(profile.multiply(profile).sum())
+            if norm > 0:
+                profile = profile / norm
+        
+        # Score the profile once; the seeds are excluded by top-k itself
+        return None, {
+            'cache_key': cache_key, 'vector': sp.csr_matrix(profile), 'k': num_recommendations,
+            'exclude': rows, 'engine': engine, 'n_probe': n_probe, 'candidates': candidates,
+        }
+    
+    def _title_rows(self, titles):
+        """Row id of each title (its first row if the title repeats), or -1 if it is not in the dataset"""
+        index = self.indices.index
+        if index.is_unique:
+            positions = index.get_indexer(titles)
+            return np.where(positions >= 0, self.indices.to_numpy()[positions], -1)
+        return np.array([np.atleast_1d(self.indices[t])[0] if t in self.indices else -1 for t in titles], dtype=np.intp)
+    
+    def _rank_prepared(self, query):
+        """Rank one prepared query on its own"""
+        return self._rank(query['vector'], query['k'], query['exclude'], query['engine'], query['n_probe'],
+                          query['candidates'])
     
-    def get_recommendations_by_features(self, genres=None, themes=None, demographics=None, num_recommendations=10):
-        """Get anime recommendations based on specific features"""
-        # Create a filter string based on provided features
-        filter_string = ""
-        if genres:
-            filter_string += " ".join(genres) + " "
-        if themes:
-            filter_string += " ".join(themes) + " "
-        if demographics:
-            filter_string += " ".join(demographics) + " "
+    def _answer(self, query, ranked):
+        """Turn a prepared query's (indices, scores) into its cached Recommendations"""
+        with stage_metrics.time('result_assembly'):
+            return self._cache_put(query['cache_key'], self._to_result(*ranked))
+    
+    def recommend_batch(self, requests):
+        """Answer many title, feature and profile requests, scoring the sparse ones in one matrix product.
+
+        Each request is a (kind, params) pair: kind is 'title', 'features' or
+        'profile' and params are the keyword arguments of get_recommendations,
+        get_recommendations_by_features or get_recommendations_for_profile. Results come back in request order and
+        match the one-at-a-time methods; a request that fails yields its
+        exception in place of a Recommendations result.
+        """
+        prepare = {'title': self._prepare_title, 'features': self._prepare_features, 'profile': self._prepare_profile}
+        results = [None] * len(requests)
+        pending = []
+        for i, (kind, params) in enumerate(requests):
+            try:
+                if kind not in prepare:
+                    raise ValueError(f"Unknown request kind '{kind}' (expected 'title', 'features' or 'profile')")
+                results[i], query = prepare[kind](**params)
+                if query is None:
+                    continue
+                if query['engine'] == 'sparse':
+                    pending.append((i, query))
+                else:
+                    results[i] = self._answer(query, self._rank_prepared(query))
+            except Exception as e:
+                results[i] = e
+        if not pending:
+            return results
         
-        if not filter_string.strip():
+        # Rank everything to the largest k; each query's top k is a prefix of that
+        k = max(query['k'] for _, query in pending)
+        ranked = self._rank_batch(
+            sp.vstack([query['vector'] for _, query in pending], format='csr'), k,
+            excludes=[query['exclude'] for _, query in pending],
+            candidates=[query['candidates'] for _, query in pending],
+        )
+        for (i, query), (indices, scores) in zip(pending, ranked):
+            results[i] = self._answer(query, (indices[:query['k']], scores[:query['k']]))
+        return results
+    
+    def get_recommendations_batch(self, titles, num_recommendations=10):
+        """Get recommendations for many titles with one sparse matrix product.
+
+        Returns a dict mapping each known title to an (indices, scores) pair of
+        arrays; titles that are not in the dataset are left out.
+        """
+        found = [t for t in dict.fromkeys(titles) if t in self.indices]
+        missing = len(set(titles)) - len(found)
+        if missing:
+            print(f"{missing} title(s) not found in the dataset.")
+        if not found:
+            return {}
+        
+        rows = np.array([self.indices[t] for t in found])
+        ranked = self._rank_batch(self.tfidf_matrix[rows], num_recommendations, excludes=[[r] for r in rows])
+        return dict(zip(found, ranked))
+    
+    def _table_lookup(self, idx, k, allowed=None):
+        """Top k live neighbors of row idx from the neighbor table, or None if it holds too few.
+
+        allowed optionally masks the rows that may be returned.
+        """
+        neighbors, scores = self.neighbor_table[0][idx], self.neighbor_table[1][idx]
+        if k <= 0:
+            # A negative k would slice from the end of the row
+            return neighbors[:0], scores[:0].astype(np.float64)
+        if allowed is not None:
+            keep = allowed[neighbors]
+            neighbors, scores = neighbors[keep], scores[keep]
+        elif self._removed_rows.size:
+            live = ~self._removed[neighbors]
+            neighbors, scores = neighbors[live], scores[live]
+        if k > len(neighbors):
+            return None
+        return neighbors[:k], scores[:k].astype(np.float64)
+    
+    def _exclusions(self, exclude=None):
+        """Rows to keep out of a result: the given ones plus every tombstoned row"""
+        if not self._removed_rows.size:
+            return exclude
+        if exclude is None:
+            return self._removed_rows
+        return np.concatenate([np.asarray(exclude, dtype=np.intp), self._removed_rows])
+    
+    def _rank(self, query_vector, k, exclude=None, engine='sparse', n_probe=DEFAULT_PROBES, candidates=None):
+        """Score one query vector against the catalog and return (indices, scores) of the top k.
+
+        When candidates (sorted row ids) is given, only those rows can be returned.
+        """
+        if engine not in ('sparse', 'ann'):
+            raise ValueError(f"Unknown engine '{engine}' (expected 'sparse' or 'ann')")
+        if engine == 'ann' and self.embedding_index is None:
+            raise ValueError("The 'ann' engine needs an embedding index; call build_embedding_index() first")
+        if candidates is not None:
+            return self._rank_candidates(query_vector, k, candidates, exclude, engine)
+        
+        if engine == 'ann':
+            with stage_metrics.time('ann_search'):
+                query = self.embedding_index.project(query_vector)[0]
+                return self.embedding_index.search(query, k, n_probe, self._exclusions(exclude))
+        if self.sharded is not None:
+            with stage_metrics.time('shard_rank'):
+                return self.sharded.rank(query_vector, k, self._exclusions(exclude))
+        with stage_metrics.time('score'):
+            scores = score_query(self.tfidf_matrix, query_vector)
+        with stage_metrics.time('top_k'):
+            top = top_k(scores, k, self._exclusions(exclude))
+        return top, scores[top]
+    
+    def _rank_candidates(self, query_vector, k, candidates, exclude=None, engine='sparse'):
+        """Top k among candidate rows (sorted row ids), scoring only those rows where that is cheaper"""
+        with stage_metrics.time('score'):
+            if engine == 'ann':
+                query = self.embedding_index.project(query_vector)[0]
+                scores = (self.embedding_index.vectors[candidates] @ query).astype(np.float64)
+            elif len(candidates) < CANDIDATE_SLICE_FRACTION * self.tfidf_matrix.shape[0]:
+                scores = score_query(self.tfidf_matrix[candidates], query_vector)
+            else:
+                scores = self._score_all(query_vector)[candidates]
+        with stage_metrics.time('top_k'):
+            return self._top_candidates(scores, k, candidates, self._exclusions(exclude))
+    
+    def _top_candidates(self, scores, k, candidates, excluded=None):
+        """Top k of scores computed for the candidate rows only, as global (indices, scores)"""
+        local_exclude = None
+        if excluded is not None and len(excluded):
+            # candidates is sorted, so each excluded row is found by binary search
+            excluded = np.asarray(excluded)
+            positions = np.searchsorted(candidates, excluded)
+            inside = positions < len(candidates)
+            positions, excluded = positions[inside], excluded[inside]
+            local_exclude = positions[candidates[positions] == excluded]
+        top = top_k(scores, k, local_exclude)
+        return candidates[top], scores[top]
+    
+    def _rank_batch(self, query_matrix, k, excludes=None, candidates=None):
+        """Score query rows in blocks and return an (indices, scores) pair per row.
+
+        candidates optionally gives each row the sorted row ids it is limited
+        to (None for no limit), exactly as in _rank.
+        """
+        ranked = []
+        for start in range(0, query_matrix.shape[0], QUERY_BLOCK_SIZE):
+            with stage_metrics.time('batch_score'):
+                block = query_matrix[start:start + QUERY_BLOCK_SIZE]
+                if self.sharded is not None:
+                    scores = self.sharded.score_queries(block)
+                else:
+                    scores = score_queries(self.tfidf_matrix, block)
+            with stage_metrics.time('batch_top_k'):
+                for i, row_scores in enumerate(scores, start):
+                    excluded = self._exclusions(excludes[i] if excludes is not None else None)
+                    rows = candidates[i] if candidates is not None else None
+                    if rows is not None:
+                        ranked.append(self._top_candidates(row_scores[rows], k, rows, excluded))
+                    else:
+                        top = top_k(row_scores, k, excluded)
+                        ranked.append((top, row_scores[top]))
+        return ranked
+    
+    def _to_result(self, anime_indices, sim_scores):
+        """Wrap the given rows and scores as a Recommendations result over the shared metadata"""
+        return Recommendations(anime_indices, sim_scores, self.result_metadata)
+    
+    def get_recommendations_by_features(self, genres=None, themes=None, demographics=None, num_recommendations=10,
+                                        engine='sparse', n_probe=DEFAULT_PROBES, match='any', exclude=None,
+                                        filters=None, as_frame=False):
+        """Get anime recommendations based on specific features.
+
+        Returns a Recommendations result, or a DataFrame with as_frame=True.
+        Only titles carrying the requested tags are scored: at least one of
+        them with match='any', all of them with match='all'. exclude maps a
+        column ('genres', 'themes', 'demographics' or 'rating') to values a
+        title must not carry, and filters maps a column to values it must
+        carry at least one of. With match='any', tags no title carries are
+        ignored.
+        """
+        resolved, query = self._prepare_features(genres, themes, demographics, num_recommendations, engine, n_probe,
+                                                 match, exclude, filters)
+        if query is not None:
+            resolved = self._answer(query, self._rank_prepared(query))
+        if as_frame:
+            with stage_metrics.time('frame_assembly'):
+                return resolved.to_frame()
+        return resolved
+    
+    def _prepare_features(self, genres=None, themes=None, demographics=None, num_recommendations=10,
+                          engine='sparse', n_probe=DEFAULT_PROBES, match='any', exclude=None, filters=None):
+        """Resolve a feature request up to scoring; returns (recommendations, None) or (None, query)"""
+        # Equivalent requests (same tags in any order or case) share one cache entry
+        genres, themes, demographics = _canonical_tags(genres), _canonical_tags(themes), _canonical_tags(demographics)
+        exclude, filters = _canonical_filters(exclude), _canonical_filters(filters)
+        cache_key = ('features', tuple(genres or ()), tuple(themes or ()), tuple(demographics or ()),
+                     num_recommendations, engine, n_probe, match, _filters_key(exclude), _filters_key(filters))
+        
+        tags = (genres or []) + (themes or []) + (demographics or [])
+        if not tags:
             print("Please provide at least one feature (genres, themes, or demographics)")
-            return pd.DataFrame()
+            return Recommendations.none(), None
+        
+        with stage_metrics.time('cache_lookup'):
+            cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached, None
+        
+        # Narrow to the titles carrying the requested tags before any scoring
+        with stage_metrics.time('facet_filter'):
+            candidates = self._facet_candidates(genres, themes, demographics, match, exclude, filters)
+        
+        # Assemble the query vector from the precomputed per-tag terms; no text is tokenized
+        with stage_metrics.time('transform'):
+            filter_vector = self.tag_vectors.vector(tags)
+        
+        # Score against the catalog and keep the top recommendations
+        return None, {
+            'cache_key': cache_key, 'vector': filter_vector, 'k': num_recommendations,
+            'exclude': None, 'engine': engine, 'n_probe': n_probe, 'candidates': candidates,
+        }
+    
+    def _facet_candidates(self, genres, themes, demographics, match='any', exclude=None, filters=None):
+        """Sorted live row ids allowed by a feature query's tags and filters, or None to consider every row"""
+        index = self.facet_index
+        requested = dict(zip(FACET_COLUMNS, (genres, themes, demographics)))
+        if match == 'all':
+            if not any(requested.values()) and not exclude and not filters:
+                return None
+            mask = index.mask(all_of=requested, none_of=exclude, one_of_each=filters)
+        elif match == 'any':
+            known = {facet: [t for t in tags or () if index.knows(facet, t)] for facet, tags in requested.items()}
+            if not any(known.values()) and not exclude and not filters:
+                return None
+            mask = index.mask(any_of=known if any(known.values()) else None, none_of=exclude, one_of_each=filters)
+        else:
+            raise ValueError(f"Unknown match mode '{match}' (expected 'any' or 'all')")
+        return np.flatnonzero(mask & ~self._removed)
+    
+    def add_titles(self, records):
+        """Add anime to the catalog without refitting; returns the new row ids.
+
+        Each record is a dict with the raw title, genres, themes, demographics,
+        rating and synopsis fields. Records are cleaned the same way as
+        preprocessing.py, vectorized with the existing vocabulary (or hashed)
+        and appended to the matrix. A record whose title is already in the
+        catalog replaces that entry: the old row is tombstoned. Once the share
+        of unknown words in added text exceeds drift_threshold, the model is
+        refit on a background thread.
+        """
+        new_rows = process_chunk(pd.DataFrame(list(records)).reindex(columns=RELEVANT_COLUMNS))
+        new_rows = new_rows.drop_duplicates('title', keep='last')
+        if new_rows.empty:
+            return []
+        
+        with self._update_lock:
+            texts = new_rows['combined_features']
+            vectors = self.tfidf.transform(texts).astype(self.tfidf_matrix.dtype)
+            added, unknown = self._count_unknown_tokens(texts)
+            
+            # Readers take no lock, so the next catalog state is built aside and
+            # swapped in at once, as refit does; nothing they hold is modified
+            version = self.model_version
+            indices = self.indices
+            removed = self._removed.copy()
+            replaced = indices[indices.index.isin(new_rows['title'])].to_numpy()
+            if len(replaced):
+                removed[replaced] = True
+                indices = indices[~indices.isin(replaced)]
+                version = self._derive_version(version, 'remove', replaced)
+            
+            start = len(self.df)
+            new_rows.index = pd.RangeIndex(start, start + len(new_rows))
+            # Keep only the loaded columns so no raw field (the synopsis above all) is carried along
+            columns = list(self.df.columns)
+            if 'combined_features' not in columns:
+                columns.append('combined_features')
+            df = pd.concat([self.df, new_rows.reindex(columns=columns)])
+            if self.lean:
+                df = _lean_frame(df)
+            matrix = sp.vstack([self.tfidf_matrix, vectors], format='csr')
+            sharded = None
+            if self.sharded is not None:
+                sharded = ShardedMatrix.from_matrix(matrix, self.sharded.n_shards, self.sharded.workers)
+            embedding_index = None
+            if self.embedding_index is not None:
+                # add() replaces the index arrays rather than writing into them, so a shallow copy is enough
+                embedding_index = copy.copy(self.embedding_index)
+                embedding_index.add(vectors)
+            indices = pd.concat([indices, pd.Series(new_rows.index, index=new_rows['title'])])
+            removed = np.concatenate([removed, np.zeros(len(new_rows), dtype=bool)])
+            version = self._derive_version(version, 'add', new_rows.index)
+            
+            # Existing rows may have new nearest neighbors, so the precomputed table is
+            # stale; the lazily built indexes are reset last so none is rebuilt from the old catalog
+            (self.df, self.tfidf_matrix, self.sharded, self.embedding_index, self.indices, self._removed,
+             self._removed_rows, self.neighbor_table, self._title_index, self._facet_index, self._tag_vectors,
+             self._result_metadata, self.model_version) = (
+                df, matrix, sharded, embedding_index, indices, removed,
+                np.flatnonzero(removed), None, None, None, None,
+                None, version,
+            )
+            self._added_tokens += added
+            self._unknown_tokens += unknown
         
-        # Transform the filter string
-        filter_vector = self.tfidf.transform([filter_string])
+        print(f"Added {len(new_rows)} anime entries (vocabulary drift {self.vocabulary_drift():.1%})")
+        self._maybe_refit()
+        return list(new_rows.index)
+    
+    def remove_titles(self, ids):
+        """Tombstone catalog rows (by row id or title); returns how many were removed.
+
+        Removed rows are never recommended or suggested again. They stay in
+        the matrix until the next refit compacts it, which renumbers rows.
+        """
+        with self._update_lock:
+            rows = set()
+            for item in ids:
+                if isinstance(item, str):
+                    if item in self.indices:
+                        rows.update(np.atleast_1d(self.indices[item]).tolist())
+                elif 0 <= int(item) < len(self.df):
+                    rows.add(int(item))
+            rows = [r for r in rows if not self._removed[r]]
+            if not rows:
+                return 0
+            
+            self._removed[rows] = True
+            self._removed_rows = np.flatnonzero(self._removed)
+            self.indices = self.indices[~self.indices.isin(rows)]
+            self._title_index = None
+            self._bump_version('remove', rows)
         
-        # Calculate similarity scores
-        sim_scores = cosine_similarity(filter_vector, self.tfidf_matrix).flatten()
+        print(f"Removed {len(rows)} anime entries")
+        return len(rows)
+    
+    def vocabulary_drift(self):
+        """Share of words in text added since the last fit that the model has no column for"""
+        return self._unknown_tokens / self._added_tokens if self._added_tokens else 0.0
+    
+    def refit(self):
+        """Refit the vectorizer on the live catalog, dropping tombstoned rows.
+
+        The new model is built without holding the update lock and swapped in
+        only if the catalog did not change in the meantime.
+        """
+        if not self._can_refit():
+            print("Cannot refit: catalog text was not kept (artifact-loaded and lean models drop it)")
+            return False
+        with self._update_lock:
+            version = self.model_version
+            df = self.df[~self._removed].reset_index(drop=True)
         
-        # Get indices of top recommendations
-        top_indices = sim_scores.argsort()[::-1][:num_recommendations]
-        top_scores = sim_scores[top_indices]
+        print(f"Refitting {self.vectorizer_kind} vectorizer on {len(df)} anime entries...")
+        tfidf = make_vectorizer(self.vectorizer_kind)
+        tfidf_matrix = tfidf.fit_transform(df['combined_features'])
         
-        # Return recommendations
-        recommendations = self.df[['title', 'genres', 'themes', 'demographics']].iloc[top_indices].copy()
-        recommendations['similarity_score'] = top_scores
+        # Rebuild the neighbor table and embedding index in use (row ids change), so
+        # title and engine='ann' requests keep working once the new model is swapped in
+        neighbor_table = embedding_index = None
+        if self._neighbor_k is not None:
+            k = min(self._neighbor_k, tfidf_matrix.shape[0] - 1)
+            blocks = [
+                neighbor_block(tfidf_matrix, start, min(start + DEFAULT_BLOCK_SIZE, tfidf_matrix.shape[0]), k)
+                for start in range(0, tfidf_matrix.shape[0], DEFAULT_BLOCK_SIZE)
+            ]
+            neighbor_table = (np.vstack([b[0] for b in blocks]), np.vstack([b[1] for b in blocks]))
+        if self._embedding_params is not None:
+            embedding_index = EmbeddingIndex(tfidf_matrix, *self._embedding_params)
         
-        # Replace any NaN values with empty strings
-        recommendations = recommendations.fillna('')
+        with self._update_lock:
+            if self.model_version != version:
+                print("Catalog changed during refit; keeping the current model")
+                return False
+            self.df, self.tfidf, self.tfidf_matrix = df, tfidf, tfidf_matrix
+            self.model_version = self._fingerprint()
+            self._reset_catalog_state()
+            self.neighbor_table, self.embedding_index = neighbor_table, embedding_index
+        print(f"Refit complete (model {self.model_version})")
+        return True
+    
+    def _can_refit(self):
+        """Whether the catalog text needed to refit was kept"""
+        return 'combined_features' in self.df.columns and not self.df['combined_features'].isna().any()
+    
+    def _maybe_refit(self):
+        """Start a background refit once vocabulary drift crosses the threshold and the text to refit on was kept"""
+        if self.vocabulary_drift() <= self.drift_threshold or not self._can_refit():
+            return
+        if self._refit_thread is not None and self._refit_thread.is_alive():
+            return
+        self._refit_thread = threading.Thread(target=self.refit, name='anime-refit', daemon=True)
+        self._refit_thread.start()
+    
+    def _count_unknown_tokens(self, texts):
+        """Count the words in texts and how many of them the fitted model does not know"""
+        if self.vectorizer_kind == 'hashing':
+            # Hashing has no vocabulary; a word is unknown if its bucket never occurred when fitting
+            counts = self.tfidf[0].transform(texts)
+            unknown = counts.data[~self._seen_columns[counts.indices]].sum()
+            return int(counts.data.sum()), int(unknown)
         
-        return recommendations.reset_index(drop=True)
+        analyzer = self.tfidf.build_analyzer()
+        vocabulary = self.tfidf.vocabulary_
+        added = unknown = 0
+        for text in texts:
+            tokens = analyzer(text)
+            added += len(tokens)
+            unknown += sum(1 for token in tokens if token not in vocabulary)
+        return added, unknown
+    
+    def _derive_version(self, version, operation, rows):
+        """Model version that follows version after an in-place catalog change"""
+        digest = hashlib.sha1(f"{version}:{operation}:".encode('utf-8'))
+        digest.update(np.asarray(list(rows), dtype=np.int64).tobytes())
+        return digest.hexdigest()[:12]
+    
+    def _bump_version(self, operation, rows):
+        """Derive a new model version after an in-place catalog change"""
+        self.model_version = self._derive_version(self.model_version, operation, rows)
 
 def main():
     # Initialize the recommender system
@@ -106,7 +1014,7 @@ def main():
     
     # Get recommendations for a specific anime
     print("\nRecommendations for 'Cowboy Bebop':")
-    recommendations = recommender.get_recommendations('Cowboy Bebop', 5)
+    recommendations = recommender.get_recommendations('Cowboy Bebop', 5, as_frame=True)
     if not recommendations.empty:
         for i, row in recommendations.iterrows():
             print(f"{i+1}. {row['title']}")
@@ -119,7 +1027,8 @@ def main():
     recommendations = recommender.get_recommendations_by_features(
         genres=['action'], 
         themes=['space'], 
-        num_recommendations=5
+        num_recommendations=5,
+        as_frame=True
     )
     if not recommendations.empty:
         for i, row in recommendations.iterrows():
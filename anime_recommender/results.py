@@ -0,0 +1,110 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Metadata columns returned with every recommendation, in response order
+RESULT_COLUMNS = ['title', 'genres', 'themes', 'demographics']
+
+class ResultMetadata:
+    """NaN-free copies of the result columns, shared by every result of one catalog state.
+
+    Values are cleaned once when the catalog loads. Their JSON encodings are
+    built on first use, so serializing a result is only string joins.
+    """
+
+    def __init__(self, df):
+        self._frame = df.reindex(columns=RESULT_COLUMNS).fillna('').reset_index(drop=True)
+        self.columns = {column: self._frame[column].to_numpy(dtype=object) for column in RESULT_COLUMNS}
+        self._encoded = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Metadata for a few rows given as tuples in RESULT_COLUMNS order, built without a DataFrame"""
+        metadata = cls.__new__(cls)
+        metadata._frame = None
+        values = list(zip(*rows)) if rows else [()] * len(RESULT_COLUMNS)
+        metadata.columns = {
+            column: np.array(['' if v is None else v for v in column_values], dtype=object)
+            for column, column_values in zip(RESULT_COLUMNS, values)
+        }
+        metadata._encoded = None
+        return metadata
+
+    @property
+    def frame(self):
+        """The metadata as a DataFrame, built on first use when created from rows"""
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.columns)
+        return self._frame
+
+    def encoded(self):
+        """Per-column arrays of JSON-encoded values"""
+        if self._encoded is None:
+            self._encoded = [
+                (column, np.array([json.dumps(v) for v in values], dtype=object))
+                for column, values in self.columns.items()
+            ]
+        return self._encoded
+
+class Recommendations:
+    """Top-k rows and similarity scores of one query, backed by shared ResultMetadata.
+
+    Results are read-only, so they can be cached and served without copying.
+    Use to_frame() for the DataFrame form and to_json() for the /recommend
+    response body.
+    """
+    __slots__ = ('indices', 'scores', 'metadata')
+
+    def __init__(self, indices, scores, metadata):
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.indices.flags.writeable = False
+        self.scores.flags.writeable = False
+        self.metadata = metadata
+
+    @classmethod
+    def none(cls):
+        """An empty result, for queries that matched nothing"""
+        return cls(np.empty(0, dtype=np.intp), np.empty(0), None)
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def empty(self):
+        return len(self.indices) == 0
+
+    @property
+    def titles(self):
+        """Titles of the recommended anime, best first"""
+        if self.empty:
+            return []
+        return self.metadata.columns['title'][self.indices].tolist()
+
+    def to_records(self):
+        """One dict per recommendation with the metadata columns and similarity_score"""
+        if self.empty:
+            return []
+        columns = [(column, values[self.indices]) for column, values in self.metadata.columns.items()]
+        return [
+            {**{column: values[i] for column, values in columns}, 'similarity_score': score}
+            for i, score in enumerate(self.scores.tolist())
+        ]
+
+    def to_frame(self):
+        """The recommendations as a DataFrame (an empty one if there are none)"""
+        if self.empty:
+            return pd.DataFrame()
+        frame = self.metadata.frame.iloc[self.indices].reset_index(drop=True)
+        frame['similarity_score'] = self.scores
+        return frame
+
+    def to_json(self):
+        """The {"recommendations": [...]} response body as UTF-8 bytes"""
+        items = []
+        if not self.empty:
+            columns = [(column, encoded[self.indices]) for column, encoded in self.metadata.encoded()]
+            for i, score in enumerate(self.scores.tolist()):
+                fields = ','.join(f'"{column}":{values[i]}' for column, values in columns)
+                items.append(f'{{{fields},"similarity_score":{score!r}}}')
+        return f'{{"recommendations":[{",".join(items)}]}}\n'.encode('utf-8')
@@ -0,0 +1,55 @@
+import numpy as np
+
+# Number of query rows scored per block in score_queries; bounds the dense
+# (block x n_rows) score buffer
+QUERY_BLOCK_SIZE = 64
+
+def _dense(queries):
+    """Densify sparse query rows (transposed) for a sparse-times-dense product"""
+    if hasattr(queries, 'toarray'):
+        return queries.toarray().T
+    return np.asarray(queries, dtype=np.float64).reshape(-1, queries.shape[-1]).T
+
+def score_query(matrix, query_vector):
+    """Score one query row against every row of matrix.
+
+    TF-IDF rows are already L2-normalized, so the plain dot product is the
+    cosine similarity without cosine_similarity's extra normalization pass.
+    """
+    return matrix.dot(_dense(query_vector)).ravel()
+
+def score_queries(matrix, queries):
+    """Score several query rows at once; returns a dense (n_queries, n_rows) array"""
+    return matrix.dot(_dense(queries)).T
+
+def top_k(scores, k, exclude=None):
+    """Indices of the k highest scores, best first.
+
+    Uses argpartition so only the k winners get sorted. Ties are broken by the
+    lower row index so results are deterministic. Rows listed in exclude are
+    never returned.
+    """
+    if exclude is not None and len(exclude):
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[part].min()
+        # Everything strictly above the k-th score is in; fill the rest from the
+        # rows tied at the threshold in row order
+        above = np.flatnonzero(scores > threshold)
+        tied = np.flatnonzero(scores == threshold)[:k - above.size]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n)
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    top = candidates[order]
+    if exclude is not None and len(exclude):
+        top = top[np.isfinite(scores[top])]
+    return top
@@ -0,0 +1,115 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# Workers forked by default; each serves requests on its own threads
+DEFAULT_WORKERS = 4
+
+def prepare_artifact(artifact_root, data_path, lean=False):
+    """Return an artifact to serve from, building one from data_path if artifact_root holds none"""
+    from artifact import build_artifact, resolve_artifact_dir
+
+    if os.path.exists(os.path.join(resolve_artifact_dir(artifact_root), 'manifest.json')):
+        return artifact_root
+    from recommender import AnimeRecommender
+
+    print(f"No artifact in '{artifact_root}'; fitting once from '{data_path}'...")
+    build_artifact(AnimeRecommender(data_path, lean=lean), artifact_root)
+    return artifact_root
+
+def load_app(artifact_root, lean=False):
+    """Import the Flask app backed by the memory-mapped artifact and build everything derived from it.
+
+    Called in the parent before forking, so the title index, facet index,
+    tag vector table, result metadata and title listing exist once and reach every worker
+    through copy-on-write pages, while the matrix stays in shared file pages.
+    """
+    os.environ['ANIME_MODEL_ARTIFACT'] = artifact_root
+    if lean:
+        os.environ['ANIME_LEAN_MODEL'] = '1'
+    import app
+
+    # The app loads the model on a background thread; wait for it so workers fork from the loaded model
+    app.wait_until_ready()
+    recommender = app.recommender
+    recommender.title_index
+    recommender.facet_index
+    recommender.tag_vectors
+    recommender.result_metadata.encoded()
+    app.get_title_listing()
+    return app.app
+
+def run_worker(wsgi_app, host, port, sock):
+    """Serve requests on the inherited listening socket until terminated"""
+    from werkzeug.serving import make_server
+
+    # Drop the parent's handlers; the parent stops every worker itself
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: sys.exit(0))
+    server = make_server(host, port, wsgi_app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+def serve(wsgi_app, host='127.0.0.1', port=5000, workers=DEFAULT_WORKERS):
+    """Bind once, fork workers that share the loaded model, and replace any that die"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    # Keep the collector from writing to every shared object page after fork
+    gc.collect()
+    gc.freeze()
+
+    children = set()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(wsgi_app, host, port, sock)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def shutdown(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(children):
+            os.waitpid(pid, 0)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on http://{host}:{sock.getsockname()[1]}/ with {workers} workers "
+          f"(pids {', '.join(str(p) for p in sorted(children))})", flush=True)
+
+    while True:
+        pid, status = os.wait()
+        children.discard(pid)
+        print(f"Worker {pid} exited with status {status}; starting a replacement", flush=True)
+        time.sleep(1)
+        spawn()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork server: load the model once and share it with every worker")
+    parser.add_argument('--artifact', default=os.environ.get('ANIME_MODEL_ARTIFACT', 'anime_recommender/model'),
+                        help="Artifact root to serve; built from --data first if it holds no model")
+    parser.add_argument('--data', default='anime_recommender/processed_anime_data.csv')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--lean', action='store_true', help="Serve the memory-lean model (see memory_report)")
+    args = parser.parse_args()
+
+    artifact_root = prepare_artifact(args.artifact, args.data, args.lean)
+    serve(load_app(artifact_root, args.lean), args.host, args.port, args.workers)
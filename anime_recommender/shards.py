@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy.sparse import csr_matrix
+from scoring import score_queries, score_query, top_k
+
+SHARD_PLAN_FILE = 'shards.json'
+
+# Artifact arrays a shard is sliced from (see artifact.py)
+MATRIX_FILES = ('tfidf_data.npy', 'tfidf_indices.npy', 'tfidf_indptr.npy')
+
+def shard_offsets(indptr, n_shards):
+    """Row boundaries splitting a CSR matrix into n_shards runs of rows with about equal non-zeros"""
+    indptr = np.asarray(indptr)
+    n_rows = len(indptr) - 1
+    n_shards = max(1, min(n_shards, n_rows))
+    targets = np.linspace(0, indptr[-1], n_shards + 1)[1:-1]
+    inner = np.searchsorted(indptr, targets)
+    # Rows with many non-zeros can swallow a target, so repeated boundaries are dropped
+    return np.unique(np.concatenate([[0], np.clip(inner, 0, n_rows), [n_rows]])).astype(np.int64)
+
+def row_slice(data, indices, indptr, start, stop, n_features, copy=False):
+    """Rows start:stop of a CSR matrix given as arrays; data and indices are views unless copy"""
+    lo, hi = int(indptr[start]), int(indptr[stop])
+    data, indices = data[lo:hi], indices[lo:hi]
+    if copy:
+        data, indices = np.array(data), np.array(indices)
+    return csr_matrix(
+        (data, indices, np.asarray(indptr[start:stop + 1]) - lo), shape=(stop - start, n_features), copy=False
+    )
+
+def write_shard_plan(path, matrix, n_shards, model_version=None):
+    """Record how the artifact matrix in path splits into shards; returns the plan"""
+    offsets = shard_offsets(matrix.indptr, n_shards)
+    plan = {
+        'n_shards': len(offsets) - 1,
+        'offsets': offsets.tolist(),
+        'n_rows': matrix.shape[0],
+        'n_features': matrix.shape[1],
+        'nnz': [int(matrix.indptr[b] - matrix.indptr[a]) for a, b in zip(offsets[:-1], offsets[1:])],
+        'model_version': model_version,
+    }
+    with open(os.path.join(path, SHARD_PLAN_FILE), 'w') as f:
+        json.dump(plan, f, indent=2)
+    return plan
+
+def has_shard_plan(path):
+    """Whether path contains a shard plan"""
+    return os.path.exists(os.path.join(path, SHARD_PLAN_FILE))
+
+def read_shard_plan(path):
+    with open(os.path.join(path, SHARD_PLAN_FILE)) as f:
+        return json.load(f)
+
+def load_shard(path, shard_id, mmap=True, plan=None):
+    """Load one shard of an artifact matrix on its own; returns (matrix, first row).
+
+    The artifact arrays are memory-mapped and sliced, so only this shard's
+    pages are ever read. Without mmap, the shard's rows are copied into memory.
+    """
+    plan = plan or read_shard_plan(path)
+    if not 0 <= shard_id < plan['n_shards']:
+        raise ValueError(f"Shard {shard_id} does not exist (the plan has {plan['n_shards']})")
+    data, indices, indptr = (np.load(os.path.join(path, name), mmap_mode='r') for name in MATRIX_FILES)
+    start, stop = plan['offsets'][shard_id], plan['offsets'][shard_id + 1]
+    return row_slice(data, indices, indptr, start, stop, plan['n_features'], copy=not mmap), start
+
+class ShardedMatrix:
+    """A matrix's rows split into shards that are scored concurrently.
+
+    Each query is scored against every shard on a thread pool (SciPy's sparse
+    products and NumPy's partitioning release the GIL), each shard keeps its
+    own top k with the same rule as top_k (higher score first, lower row id
+    on ties), and a heap merges the shard lists. The result is exactly what
+    top_k over the whole matrix returns. The pool is created on first use in
+    each process, so a sharded model loaded before forking works in the workers.
+    """
+
+    def __init__(self, shards, offsets, workers=None):
+        self.shards = list(shards)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.n_shards = len(self.shards)
+        self.workers = workers or min(self.n_shards, os.cpu_count() or 1)
+        self._pool = None
+        self._pid = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_matrix(cls, matrix, n_shards, workers=None, offsets=None):
+        """Split a CSR matrix into shards that share its arrays (at offsets, if given)"""
+        matrix = matrix.tocsr()
+        if offsets is None:
+            offsets = shard_offsets(matrix.indptr, n_shards)
+        shards = [
+            row_slice(matrix.data, matrix.indices, matrix.indptr, a, b, matrix.shape[1])
+            for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+        return cls(shards, offsets, workers)
+
+    @classmethod
+    def load(cls, path, mmap=True, workers=None):
+        """Load every shard of an artifact's shard plan, each on its own"""
+        plan = read_shard_plan(path)
+        shards = [load_shard(path, i, mmap, plan)[0] for i in range(plan['n_shards'])]
+        return cls(shards, plan['offsets'], workers)
+
+    def _map(self, fn):
+        """fn(shard_id) for every shard, on the pool when there is more than one shard and worker"""
+        if self.n_shards == 1 or self.workers <= 1:
+            return [fn(i) for i in range(self.n_shards)]
+        if self._pid != os.getpid():
+            with self._pool_lock:
+                if self._pid != os.getpid():
+                    # Pool threads do not survive fork, so a child starts its own
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='shard')
+                    self._pid = os.getpid()
+        return list(self._pool.map(fn, range(self.n_shards)))
+
+    def _local_exclusions(self, excluded, shard_id):
+        """Excluded global rows that fall in shard_id, as shard-local row ids"""
+        if excluded is None or not len(excluded):
+            return None
+        start, stop = self.offsets[shard_id], self.offsets[shard_id + 1]
+        return excluded[(excluded >= start) & (excluded < stop)] - start
+
+    def rank(self, query_vector, k, exclude=None):
+        """(indices, scores) of the k best rows for one query, identical to top_k over the whole matrix"""
+        excluded = None if exclude is None else np.asarray(exclude, dtype=np.intp)
+
+        def shard_top(shard_id):
+            scores = score_query(self.shards[shard_id], query_vector)
+            top = top_k(scores, k, self._local_exclusions(excluded, shard_id))
+            return top + self.offsets[shard_id], scores[top]
+
+        # Each shard list is already ordered by (-score, row), so merging them keeps that order
+        merged = heapq.merge(*(zip((-scores).tolist(), rows.tolist()) for rows, scores in self._map(shard_top)))
+        best = list(itertools.islice(merged, k))
+        return np.array([row for _, row in best], dtype=np.intp), np.array([-score for score, _ in best])
+
+    def score(self, query_vector):
+        """Scores of one query against every row, computed shard by shard in parallel"""
+        return np.concatenate(self._map(lambda i: score_query(self.shards[i], query_vector)))
+
+    def score_queries(self, queries):
+        """Dense (n_queries, n_rows) scores of several query rows, computed shard by shard in parallel"""
+        return np.hstack(self._map(lambda i: score_queries(self.shards[i], queries)))
+
+    def nbytes(self):
+        """Bytes of the per-shard row pointers; data and indices belong to the sharded matrix"""
+        return sum(shard.indptr.nbytes for shard in self.shards)
+
+if __name__ == "__main__":
+    import argparse
+    from artifact import load_artifact, resolve_artifact_dir
+
+    parser = argparse.ArgumentParser(description="Split a model artifact's matrix into independently loadable shards")
+    parser.add_argument('--artifact', default='anime_recommender/model',
+                        help="Artifact built by artifact.py; the shard plan is written next to it")
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    out_dir = resolve_artifact_dir(args.artifact)
+    _, _, matrix, manifest = load_artifact(out_dir, mmap=True)
+    plan = write_shard_plan(out_dir, matrix, args.shards, manifest['model_version'])
+    for i, (start, stop) in enumerate(zip(plan['offsets'][:-1], plan['offsets'][1:])):
+        print(f"  shard {i}: rows {start}-{stop - 1} ({stop - start} rows, {plan['nnz'][i]} non-zeros)")
+    print(f"Shard plan for {plan['n_shards']} shards written to '{out_dir}'")
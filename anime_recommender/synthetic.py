@@ -0,0 +1,148 @@
+import time
+import numpy as np
+import pandas as pd
+from preprocessing import RELEVANT_COLUMNS, process_chunk
+
+# Named catalog sizes used by the benchmark suite
+CATALOG_SIZES = {'10k': 10_000, '65k': 65_000, '500k': 500_000, '2M': 2_000_000}
+
+# Rows generated per chunk; each chunk has its own seeded generator, so output
+# depends only on the seed and the row count
+CHUNK_ROWS = 50_000
+
+# Tag pools in rough order of popularity on the real dataset; draws follow a
+# Zipf-like curve so a few tags dominate and a long tail stays rare
+GENRES = [
+    'Comedy', 'Action', 'Fantasy', 'Adventure', 'Drama', 'Sci-Fi', 'Romance', 'Slice of Life',
+    'Supernatural', 'Mystery', 'Sports', 'Ecchi', 'Avant Garde', 'Horror', 'Suspense',
+    'Award Winning', 'Boys Love', 'Girls Love', 'Gourmet', 'Erotica',
+]
+THEMES = [
+    'School', 'Music', 'Historical', 'Mecha', 'Military', 'Super Power', 'Parody', 'Space',
+    'Mythology', 'Isekai', 'Martial Arts', 'Adult Cast', 'Anthropomorphic', 'Strategy Game',
+    'Psychological', 'Harem', 'Iyashikei', 'Team Sports', 'Gore', 'Detective', 'Samurai',
+    'Cute Girls Doing Cute Things', 'Vampire', 'Time Travel', 'Workplace', 'Mahou Shoujo',
+    'Idols (Female)', 'Reincarnation', 'Racing', 'Video Game', 'Survival', 'Otaku Culture',
+    'Gag Humor', 'Performing Arts', 'Love Polygon', 'Childcare', 'Delinquents', 'Organized Crime',
+    'Medical', 'Showbiz',
+]
+DEMOGRAPHICS = ['Shounen', 'Seinen', 'Kids', 'Shoujo', 'Josei']
+RATINGS = [
+    'PG-13 - Teens 13 or older', 'G - All Ages', 'PG - Children', 'R - 17+ (violence & profanity)',
+    'R+ - Mild Nudity', 'Rx - Hentai',
+]
+TITLE_WORDS = [
+    'Blue', 'Steel', 'Crimson', 'Spirit', 'Sky', 'Shadow', 'Star', 'Moon', 'Dragon', 'Sword',
+    'Academy', 'Hunter', 'Chronicle', 'Legend', 'Quest', 'Kingdom', 'Heart', 'Ghost', 'Storm',
+    'Garden', 'Knight', 'Witch', 'Summer', 'Winter', 'Eternal', 'Lost', 'Last', 'Hidden',
+]
+
+# Synopsis shape: log-normal word counts and a Zipf-distributed vocabulary,
+# with a share of words drawn from per-genre topic lists so titles that share
+# genres also share wording
+VOCABULARY_SIZE = 20_000
+SYNOPSIS_MEDIAN_WORDS = 90
+SYNOPSIS_SIGMA = 0.6
+TOPIC_WORDS = 40
+TOPIC_SHARE = 0.15
+
+# Share of rows with each field missing
+NULL_RATES = {'genres': 0.08, 'themes': 0.35, 'demographics': 0.45, 'rating': 0.02, 'synopsis': 0.04}
+
+_SYLLABLES = ['ka', 'ri', 'to', 'mu', 'sa', 'ne', 'ho', 'yu', 'shi', 'ra', 'ko', 'mi', 'na', 'te',
+              'zu', 'ha', 'ke', 'ro', 'chi', 'an', 'el', 'or', 'is', 'ven', 'dar', 'lo']
+
+def parse_size(size):
+    """Row count for a named size ('65k'), a suffixed number ('250k', '1.5M') or a plain integer"""
+    if size in CATALOG_SIZES:
+        return CATALOG_SIZES[size]
+    text = str(size).strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    if multiplier != 1:
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+def _zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def make_vocabulary(size=VOCABULARY_SIZE, seed=0):
+    """Distinct made-up words built from syllables, most frequent first"""
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < size:
+        n_syllables = rng.integers(2, 5, size=size)
+        picks = rng.integers(0, len(_SYLLABLES), size=(size, 4))
+        for row, count in zip(picks, n_syllables):
+            words.add(''.join(_SYLLABLES[i] for i in row[:count]))
+    return np.array(sorted(words)[:size], dtype=object)[rng.permutation(size)]
+
+def _pick_tags(rng, pool, counts, exponent):
+    """Distinct tags per row, weighted by popularity (Gumbel top-k over Zipf weights)"""
+    keys = np.log(_zipf_weights(len(pool), exponent)) + rng.gumbel(size=(len(counts), len(pool)))
+    order = np.argsort(-keys, axis=1)
+    return [', '.join(pool[j] for j in order[i, :c]) for i, c in enumerate(counts)], order[:, 0]
+
+def generate_raw_chunk(start, n_rows, vocabulary, seed=0):
+    """Raw-format rows start .. start + n_rows, as preprocessing.py would read them"""
+    rng = np.random.default_rng([seed, start])
+    genres, primary = _pick_tags(rng, GENRES, rng.choice([1, 2, 3, 4], n_rows, p=[0.3, 0.35, 0.25, 0.1]), 1.0)
+    themes, _ = _pick_tags(rng, THEMES, rng.choice([1, 2, 3], n_rows, p=[0.6, 0.3, 0.1]), 0.9)
+    demographics = np.asarray(DEMOGRAPHICS, dtype=object)[rng.choice(len(DEMOGRAPHICS), n_rows, p=_zipf_weights(5, 1.3))]
+    ratings = np.asarray(RATINGS, dtype=object)[rng.choice(len(RATINGS), n_rows, p=_zipf_weights(6, 1.2))]
+
+    # Each genre gets its own topic words from the mid-frequency band of the vocabulary
+    topic_rng = np.random.default_rng(seed)
+    topics = topic_rng.choice(np.arange(200, 5000), size=(len(GENRES), TOPIC_WORDS), replace=False)
+
+    lengths = np.clip(rng.lognormal(np.log(SYNOPSIS_MEDIAN_WORDS), SYNOPSIS_SIGMA, n_rows), 8, 600).astype(int)
+    words = rng.choice(len(vocabulary), size=lengths.sum(), p=_zipf_weights(len(vocabulary), 1.05))
+    owner = np.repeat(np.arange(n_rows), lengths)
+    topical = rng.random(len(words)) < TOPIC_SHARE
+    words[topical] = topics[primary[owner[topical]], rng.integers(0, TOPIC_WORDS, topical.sum())]
+    tokens = vocabulary[words]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    synopses = [' '.join(tokens[offsets[i]:offsets[i + 1]]).capitalize() + '.' for i in range(n_rows)]
+
+    first, second = rng.integers(0, len(TITLE_WORDS), (2, n_rows))
+    titles = [f"{TITLE_WORDS[a]} {TITLE_WORDS[b]} {start + i + 1}" for i, (a, b) in enumerate(zip(first, second))]
+    if start == 0:
+        # Keep the titles used by the smoke tests and examples
+        titles[:2] = ['Cowboy Bebop', 'Naruto'][:n_rows]
+
+    chunk = pd.DataFrame({
+        'title': titles, 'genres': genres, 'themes': themes, 'demographics': demographics,
+        'rating': ratings, 'synopsis': synopses,
+    }, index=pd.RangeIndex(start, start + n_rows))
+    for column, rate in NULL_RATES.items():
+        chunk.loc[rng.random(n_rows) < rate, column] = np.nan
+    return chunk[RELEVANT_COLUMNS]
+
+def iter_catalog(n_rows, seed=0):
+    """Yield processed chunks of a synthetic catalog (same format as processed_anime_data.csv)"""
+    vocabulary = make_vocabulary(seed=seed)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        yield process_chunk(generate_raw_chunk(start, min(CHUNK_ROWS, n_rows - start), vocabulary, seed))
+
+def write_catalog(path, n_rows, seed=0):
+    """Write a synthetic processed catalog to path chunk by chunk; returns the rows written"""
+    rows_out = 0
+    start = time.perf_counter()
+    for chunk in iter_catalog(n_rows, seed):
+        chunk.to_csv(path, index=False, encoding='utf-8', header=rows_out == 0, mode='w' if rows_out == 0 else 'a')
+        rows_out += len(chunk)
+        print(f"  {rows_out} rows written ({rows_out / (time.perf_counter() - start):.0f} rows/s)", end='\r')
+    print()
+    return rows_out
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic processed anime catalog")
+    parser.add_argument('--rows', default='65k', help=f"Row count or one of {', '.join(CATALOG_SIZES)}")
+    parser.add_argument('--out', default='anime_recommender/synthetic_anime_data.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    n_rows = write_catalog(args.out, parse_size(args.rows), args.seed)
+    print(f"Wrote {n_rows} rows to '{args.out}'")
@@ -0,0 +1,70 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+class TagVectorTable:
+    """Feature-query vectors assembled from precomputed per-tag term counts.
+
+    Every known tag is run through the fitted vectorizer's analyzer once and
+    stored as the columns and counts of its terms ("slice of life" ->
+    "slice", "life"). A query vector is the summed counts of its tags scaled
+    by the idf weights and L2-normalized, which is what transform() returns
+    for the tags joined by spaces, but with no tokenizing, stop-word
+    filtering or vocabulary lookup per request. Tags outside the table are
+    analyzed on the fly and not kept.
+    """
+
+    def __init__(self, vectorizer, tags):
+        self.vectorizer = vectorizer
+        # The hashing pipeline counts with its first step and weights with its last
+        self.hashing = hasattr(vectorizer, 'steps')
+        weighting = vectorizer[-1] if self.hashing else vectorizer
+        if weighting.norm not in ('l2', None):
+            raise ValueError(f"Unsupported vectorizer norm '{weighting.norm}' (expected 'l2' or None)")
+        self.idf = weighting.idf_ if weighting.use_idf else None
+        self.norm = weighting.norm
+        self.sublinear_tf = weighting.sublinear_tf
+        if self.hashing:
+            self.n_features = vectorizer[0].n_features
+        else:
+            self.n_features = len(vectorizer.vocabulary_)
+            self._analyzer = vectorizer.build_analyzer()
+        self.terms = {}
+        for tag in tags:
+            tag = str(tag).strip().lower()
+            if tag and tag not in self.terms:
+                self.terms[tag] = self._analyze(tag)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _analyze(self, tag):
+        """(columns, counts) of the terms the vectorizer extracts from tag"""
+        if self.hashing:
+            counts = self.vectorizer[0].transform([tag]).tocsr()
+            counts.sum_duplicates()
+            return counts.indices.astype(np.int32), counts.data.astype(np.float64)
+        vocabulary = self.vectorizer.vocabulary_
+        columns = np.array([vocabulary[token] for token in self._analyzer(tag) if token in vocabulary], dtype=np.int32)
+        columns, counts = np.unique(columns, return_counts=True)
+        return columns, counts.astype(np.float64)
+
+    def vector(self, tags):
+        """1 x n_features CSR query vector for tags, matching transform([' '.join(tags)])"""
+        entries = [self.terms.get(tag) or self._analyze(tag) for tag in tags]
+        columns = np.concatenate([columns for columns, _ in entries]) if entries else np.empty(0, dtype=np.int32)
+        counts = np.concatenate([counts for _, counts in entries]) if entries else np.empty(0)
+        columns, inverse = np.unique(columns, return_inverse=True)
+        values = np.bincount(inverse, weights=counts, minlength=len(columns)).astype(np.float64, copy=False)
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        if self.idf is not None:
+            values *= self.idf[columns]
+        if self.norm == 'l2' and len(values):
+            norm = np.sqrt(np.dot(values, values))
+            if norm > 0:
+                values /= norm
+        return csr_matrix((values, columns, np.array([0, len(columns)])), shape=(1, self.n_features))
+
+    def nbytes(self):
+        """Bytes held by the per-tag column and count arrays"""
+        return sum(columns.nbytes + counts.nbytes for columns, counts in self.terms.values())
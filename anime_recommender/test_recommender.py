@@ -1,5 +1,9 @@
+import os
+import tempfile
 import pandas as pd
 from recommender import AnimeRecommender
+from preprocessing import clean_text, clean_text_column
+from precomputed import PrecomputedRecommender, build_database
 
 def test_recommender():
     """Test the anime recommender system"""
@@ -13,7 +17,7 @@ def test_recommender():
     # Test 1: Get recommendations for a specific anime
     print("\nTest 1: Recommendations for 'Cowboy Bebop'")
     print("-" * 40)
-    recommendations = recommender.get_recommendations('Cowboy Bebop', 5)
+    recommendations = recommender.get_recommendations('Cowboy Bebop', 5, as_frame=True)
     if not recommendations.empty:
         print(f"Found {len(recommendations)} recommendations:")
         for i, row in recommendations.iterrows():
@@ -24,7 +28,7 @@ def test_recommender():
     # Test 2: Get recommendations for another anime
     print("\nTest 2: Recommendations for 'Naruto'")
     print("-" * 40)
-    recommendations = recommender.get_recommendations('Naruto', 5)
+    recommendations = recommender.get_recommendations('Naruto', 5, as_frame=True)
     if not recommendations.empty:
         print(f"Found {len(recommendations)} recommendations:")
         for i, row in recommendations.iterrows():
@@ -38,7 +42,8 @@ def test_recommender():
     recommendations = recommender.get_recommendations_by_features(
         genres=['action'], 
         themes=['adventure'], 
-        num_recommendations=5
+        num_recommendations=5,
+        as_frame=True
     )
     if not recommendations.empty:
         print(f"Found {len(recommendations)} recommendations:")
@@ -54,7 +59,8 @@ def test_recommender():
     print("-" * 40)
     recommendations = recommender.get_recommendations_by_features(
         demographics=['shounen'], 
-        num_recommendations=5
+        num_recommendations=5,
+        as_frame=True
     )
     if not recommendations.empty:
         print(f"Found {len(recommendations)} recommendations:")
@@ -67,7 +73,98 @@ def test_recommender():
     # Test 5: Test with non-existent anime
     print("\nTest 5: Non-existent anime 'NonExistentAnime'")
     print("-" * 40)
-    recommendations = recommender.get_recommendations('NonExistentAnime', 5)
+    recommendations = recommender.get_recommendations('NonExistentAnime', 5, as_frame=True)
+    
+    # Test 6: Filter candidates by content rating before ranking
+    print("\nTest 6: Recommendations for 'Naruto' excluding Rx-rated anime")
+    print("-" * 40)
+    recommendations = recommender.get_recommendations('Naruto', 5, exclude={'rating': ['rx']})
+    if not recommendations.empty:
+        print(f"Found {len(recommendations.indices)} recommendations:")
+        ratings = recommender.df['rating'].iloc[recommendations.indices].astype(str)
+        for i, (title, score, rating) in enumerate(zip(recommendations.titles, recommendations.scores, ratings)):
+            print(f"  {i+1}. {title} (Score: {score:.4f})")
+            print(f"     Rating: {rating}")
+        assert not ratings.str.lower().str.startswith('rx').any()
+    else:
+        print("No recommendations found.")
+    
+    # Test 7: Recommendations for a watch history of several titles
+    print("\nTest 7: Profile of 'Cowboy Bebop' and 'Naruto'")
+    print("-" * 40)
+    recommendations = recommender.get_recommendations_for_profile(
+        ['Cowboy Bebop', 'Naruto'], weights=[2.0, 1.0], num_recommendations=5, as_frame=True
+    )
+    if not recommendations.empty:
+        print(f"Found {len(recommendations)} recommendations:")
+        for i, row in recommendations.iterrows():
+            print(f"  {i+1}. {row['title']} (Score: {row['similarity_score']:.4f})")
+        assert not recommendations['title'].isin(['Cowboy Bebop', 'Naruto']).any()
+    else:
+        print("No recommendations found.")
+    # A zero-weight seed shapes nothing but is still watched, so never recommended
+    everything = recommender.get_recommendations_for_profile(
+        ['Naruto', 'Cowboy Bebop'], weights=[1.0, 0.0], num_recommendations=len(recommender.df)
+    )
+    assert 'Cowboy Bebop' not in everything.titles
+    
+    # Test 8: Feature-query vectors built from the tag table match the vectorizer's transform
+    print("\nTest 8: Tag table vector for action, slice of life and shounen")
+    print("-" * 40)
+    tags = ['action', 'slice of life', 'shounen']
+    difference = recommender.tag_vectors.vector(tags) - recommender.tfidf.transform([' '.join(tags)])
+    print(f"Largest difference: {abs(difference).max() if difference.nnz else 0.0:.2e}")
+    assert difference.nnz == 0 or abs(difference).max() < 1e-12
+    
+    # Test 9: A sharded matrix ranks exactly like the whole matrix
+    print("\nTest 9: 'Naruto' recommendations from 3 shards")
+    print("-" * 40)
+    recommender.result_cache.clear()
+    whole = recommender.get_recommendations('Naruto', 5)
+    recommender.shard(3)
+    recommender.result_cache.clear()
+    sharded = recommender.get_recommendations('Naruto', 5)
+    recommender.shard(1)
+    print(f"Shards: 3, identical: {list(sharded.indices) == list(whole.indices)}")
+    assert list(sharded.indices) == list(whole.indices) and list(sharded.scores) == list(whole.scores)
+    
+    # Test 10: Adding a title that is already in the catalog replaces its entry
+    print("\nTest 10: Re-adding 'Naruto'")
+    print("-" * 40)
+    old_row = recommender.indices['Naruto']
+    row = recommender.df.loc[old_row]
+    record = {'title': 'Naruto', 'genres': row['genres'], 'rating': row['rating'], 'synopsis': row['combined_features']}
+    new_row, = recommender.add_titles([record])
+    recommendations = recommender.get_recommendations('Naruto', 5)
+    print(f"Row {old_row} replaced by row {new_row}: {recommendations.titles}")
+    assert recommender.indices['Naruto'] == new_row and old_row not in recommendations.indices
+    assert len(recommendations) == 5 and all(0 <= i < len(recommender.df) for i in recommendations.indices)
+    
+    # Test 11: The precomputed SQLite backend answers like the model it was built from
+    print("\nTest 11: Precomputed recommendations for 'Cowboy Bebop'")
+    print("-" * 40)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'recommendations.db')
+        build_database(recommender, path, k=10)
+        precomputed = PrecomputedRecommender(path).get_recommendations('Cowboy Bebop', 5, as_frame=True)
+    expected = recommender.get_recommendations('Cowboy Bebop', 5, as_frame=True)
+    print(f"Found {len(precomputed)} recommendations:")
+    for i, row in precomputed.iterrows():
+        print(f"  {i+1}. {row['title']} (Score: {row['similarity_score']:.4f})")
+    assert precomputed['title'].tolist() == expected['title'].tolist()
+    
+    # Test 12: The column-at-once cleaner matches clean_text cell by cell
+    print("\nTest 12: clean_text_column on awkward cells")
+    print("-" * 40)
+    cells = ['Action, Adventure', None, '   ', '\t\n', 'x\x1cy', 'x\x85y', 'x\u3000y', '\u3000',
+             ',Comedy,', ' , Drama , ', 'Émile’s 2nd!!', '']
+    # A cell holding the NUL separator sends the whole column down the per-cell path
+    for values in (cells, cells + ['a\0b']):
+        column = pd.Series(values, index=range(10, 10 + len(values)), dtype=object)
+        cleaned, expected = clean_text_column(column), column.apply(clean_text)
+        identical = cleaned.tolist() == expected.tolist() and cleaned.index.equals(expected.index)
+        print(f"{len(values)} cells identical: {identical}")
+        assert identical
     
     print("\n" + "="*60)
     print("TESTING COMPLETED")
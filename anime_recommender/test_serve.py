@@ -0,0 +1,122 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import urllib.request
+import pytest
+from recommender import AnimeRecommender
+from artifact import build_artifact
+
+SERVE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+
+def process_memory_kb(pid):
+    """RSS, PSS and private (unshared) memory of a process in kB, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(artifact_root, workers):
+    """Launch serve.py and return (process, port, worker pids) once it is accepting connections"""
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, SERVE_SCRIPT, '--artifact', artifact_root, '--workers', str(workers), '--port', str(port)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    for line in proc.stdout:
+        if line.startswith('Serving on'):
+            pids = [int(p) for p in line.split('(pids ')[1].rstrip(')\n').split(', ')]
+            return proc, port, pids
+    raise RuntimeError("serve.py exited before it started serving")
+
+def exercise(port, titles, rounds=3):
+    """Send title and feature requests so every worker touches the model"""
+    url = f'http://127.0.0.1:{port}/recommend'
+    for _ in range(rounds):
+        for title in titles:
+            body = json.dumps({'type': 'anime', 'anime_title': title, 'num_recommendations': 10}).encode('utf-8')
+            request = urllib.request.Request(url, body, {'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request) as response:
+                assert response.status == 200
+                assert 'recommendations' in json.load(response)
+        body = json.dumps({'type': 'features', 'genres': ['action']}).encode('utf-8')
+        request = urllib.request.Request(url, body, {'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 200
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps_rollup'), reason="needs Linux /proc memory accounting")
+def test_worker_memory_stays_flat():
+    """Per-worker private memory should not grow with the number of pre-forked workers"""
+    recommender = AnimeRecommender()
+    titles = recommender.df['title'].dropna().head(20).tolist()
+
+    with tempfile.TemporaryDirectory() as artifact_root:
+        build_artifact(recommender, artifact_root)
+        del recommender
+
+        print("\n" + "="*60)
+        print("PER-WORKER MEMORY (kB)")
+        print("="*60)
+        private_by_workers = {}
+        for workers in (1, 2, 4):
+            proc, port, pids = start_server(artifact_root, workers)
+            try:
+                exercise(port, titles)
+                usage = [process_memory_kb(pid) for pid in pids]
+            finally:
+                proc.send_signal(signal.SIGTERM)
+                proc.wait(timeout=30)
+            private = max(u['private'] for u in usage)
+            private_by_workers[workers] = private
+            print(f"{workers} worker(s): max private {private:8d}   "
+                  f"mean rss {sum(u['rss'] for u in usage) // len(usage):8d}   "
+                  f"mean pss {sum(u['pss'] for u in usage) // len(usage):8d}")
+
+        # Each extra worker only adds its own private pages; the model is not copied
+        baseline = private_by_workers[1]
+        for workers, private in private_by_workers.items():
+            assert private <= baseline * 1.25 + 4096, (workers, private, baseline)
+
+# Imports the app, forks while the model is still loading, and polls /readyz in the child
+FORK_AFTER_IMPORT = """
+import os, sys, time
+import app
+pid = os.fork()
+if pid:
+    _, status = os.waitpid(pid, 0)
+    sys.exit(os.waitstatus_to_exitcode(status))
+client = app.app.test_client()
+deadline = time.monotonic() + 120
+while time.monotonic() < deadline:
+    if client.get('/readyz').status_code == 200:
+        os._exit(0)
+    time.sleep(0.2)
+os._exit(1)
+"""
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_worker_forked_during_load_becomes_ready():
+    """A worker forked before the model finished loading (gunicorn --preload) loads it itself"""
+    app_dir = os.path.dirname(SERVE_SCRIPT)
+    result = subprocess.run([sys.executable, '-c', FORK_AFTER_IMPORT], cwd=os.path.dirname(app_dir),
+                            env={**os.environ, 'PYTHONPATH': app_dir}, stdout=subprocess.DEVNULL, timeout=180)
+    assert result.returncode == 0
+
+if __name__ == "__main__":
+    test_worker_memory_stays_flat()
+    test_worker_forked_during_load_becomes_ready()
@@ -0,0 +1,119 @@
+import bisect
+import re
+from collections import defaultdict
+import numpy as np
+
+# Minimum trigram (Dice) similarity for a title to count as a typo match
+FUZZY_THRESHOLD = 0.3
+
+_NON_ALNUM = re.compile(r'[\W_]+')
+
+def normalize_title(title):
+    """Casefold a title and collapse punctuation and whitespace to single spaces"""
+    return _NON_ALNUM.sub(' ', str(title).casefold()).strip()
+
+def _trigrams(key):
+    """Distinct character trigrams of a normalized title, padded so short words still count"""
+    padded = f' {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TitleIndex:
+    """Normalized title lookup with prefix, substring and typo-tolerant search.
+
+    Built once from the catalog titles. Prefix lookups bisect a sorted key
+    array; substring and fuzzy lookups go through a character trigram
+    inverted index, so no query scans every title.
+    """
+
+    def __init__(self, titles):
+        self.titles = np.asarray(titles, dtype=object)
+        self.keys = [normalize_title(t) for t in self.titles]
+
+        order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self._sorted_keys = [self.keys[i] for i in order]
+        self.sorted_rows = np.array(order, dtype=np.int64)
+
+        postings = defaultdict(list)
+        gram_counts = np.zeros(len(self.keys), dtype=np.int32)
+        for row, key in enumerate(self.keys):
+            grams = _trigrams(key)
+            gram_counts[row] = len(grams)
+            for gram in grams:
+                postings[gram].append(row)
+        self._postings = {gram: np.array(rows, dtype=np.int64) for gram, rows in postings.items()}
+        self._gram_counts = gram_counts
+
+    def __len__(self):
+        return len(self.titles)
+
+    def exact(self, query):
+        """Rows whose normalized title equals the normalized query"""
+        key = normalize_title(query)
+        lo = bisect.bisect_left(self._sorted_keys, key)
+        hi = bisect.bisect_right(self._sorted_keys, key)
+        return self.sorted_rows[lo:hi]
+
+    def prefix_range(self, query):
+        """Positions [lo, hi) in sorted_rows of the titles starting with query (all titles if empty)"""
+        key = normalize_title(query)
+        if not key:
+            return 0, len(self.sorted_rows)
+        lo = bisect.bisect_left(self._sorted_keys, key)
+        hi = bisect.bisect_left(self._sorted_keys, key + '\U0010ffff')
+        return lo, hi
+
+    def prefix(self, query):
+        """Rows whose normalized title starts with the normalized query, in title order"""
+        if not normalize_title(query):
+            return self.sorted_rows[:0]
+        lo, hi = self.prefix_range(query)
+        return self.sorted_rows[lo:hi]
+
+    def substring(self, query):
+        """Rows whose normalized title contains the normalized query"""
+        key = normalize_title(query)
+        if len(key) < 3:
+            return self.prefix(query)
+        grams = [key[i:i + 3] for i in range(len(key) - 2)]
+        postings = [self._postings.get(g) for g in set(grams)]
+        if any(p is None for p in postings):
+            return np.empty(0, dtype=np.int64)
+        # Intersect the shortest posting lists first, then confirm the real substring
+        postings.sort(key=len)
+        candidates = postings[0]
+        for p in postings[1:]:
+            candidates = np.intersect1d(candidates, p, assume_unique=True)
+            if not candidates.size:
+                break
+        return np.array([r for r in candidates if key in self.keys[r]], dtype=np.int64)
+
+    def fuzzy(self, query, limit=10, threshold=FUZZY_THRESHOLD):
+        """Rows ranked by trigram similarity to the query, for catching typos"""
+        key = normalize_title(query)
+        grams = _trigrams(key)
+        postings = [self._postings[g] for g in grams if g in self._postings]
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.keys))
+        candidates = np.flatnonzero(shared)
+        dice = 2.0 * shared[candidates] / (len(grams) + self._gram_counts[candidates])
+        keep = dice >= threshold
+        candidates, dice = candidates[keep], dice[keep]
+        order = np.lexsort((candidates, -dice))[:limit]
+        return candidates[order]
+
+    def search(self, query, limit=10):
+        """Best matching titles for query: exact, then prefix, substring and typo matches"""
+        if not normalize_title(query):
+            return []
+        results = []
+        seen = set()
+        for lookup in (self.exact, self.prefix, self.substring, lambda q: self.fuzzy(q, limit)):
+            for row in lookup(query):
+                title = self.titles[row]
+                if title not in seen:
+                    seen.add(title)
+                    results.append(title)
+                    if len(results) >= limit:
+                        return results
+        return results